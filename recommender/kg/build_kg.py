@@ -2,38 +2,62 @@
 import networkx as nx
 import numpy as np
 from django.db import transaction
+from django.db.models import Max, Min, Q
 from django.conf import settings
 from recommender.models import (
     Concept, Course, PrerequisiteDependency,
     CourseConcept, ParentSonRelation
 )
+from recommender.kg.csr_graph import CSRGraph
+from recommender.kg.landmarks import LandmarkIndex, select_landmarks
+from recommender.kg.cold_start import ColdStartIndex, prerequisites_from_graph
+from recommender.kg.course_closure import CourseClosureIndex
+from recommender.kg.contraction import ContractionHierarchy
+import hashlib
 import pickle
 import os
+import shutil
+from datetime import datetime
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class KnowledgeGraphBuilder:
-    GRAPH_PATH = os.path.join(settings.BASE_DIR, 'data/models/kg_graph.pkl')
+    # 每次构建写入独立的版本目录，CURRENT 指针文件原子切换到最新版本
+    SNAPSHOT_ROOT = os.path.join(settings.BASE_DIR, 'data/models/kg_snapshots')
+    CURRENT_POINTER = 'CURRENT'
+    KEEP_SNAPSHOTS = 5  # 保留最近N个版本用于回滚
+    GRAPH_FILE = 'kg_graph.pkl'
+    CSR_DIR = 'csr'  # 紧凑CSR格式（可mmap）
+    LANDMARKS_FILE = 'landmarks.npz'  # ALT地标距离表
+    LANDMARK_COUNT = 16
+    COLD_START_FILE = 'cold_start.json'  # 冷启动先修闭包索引
+    COURSE_CLOSURE_FILE = 'course_closure.npz'  # 全课程传递先修闭包 + 拓扑层级
+    CONTRACTION_FILE = 'contraction.npz'  # 收缩层次覆盖图（可选）
+    BUILD_CONTRACTION = getattr(settings, 'KG_BUILD_CONTRACTION', False)
+    MAX_CONTRACTION_NODES = getattr(settings, 'KG_MAX_CONTRACTION_NODES', ContractionHierarchy.MAX_NODES)
     WEIGHT_SCALING_FACTOR = 1000  # 将权重放大到合理范围
 
-    def __init__(self):
+    def __init__(self, contraction=None):
+        # 是否在构建后额外预处理收缩层次（图谱每晚更新一次，查询量远大于构建量时开启）
+        self.contraction = self.BUILD_CONTRACTION if contraction is None else contraction
         self.graph = nx.DiGraph()
         self.node_mapping = {}
+        self._next_index = 0
         self._init_normalization_params()
 
     def _init_normalization_params(self):
-        """初始化归一化参数"""
-        # 获取所有topsis_score用于归一化
-        all_scores = Concept.objects.values_list('topsis_score', flat=True)
-        self.min_score = min(all_scores) if all_scores else 0
-        self.max_score = max(all_scores) if all_scores else 1e-5
+        """初始化归一化参数（每张表一次聚合查询，不把整列取回Python）"""
+        # topsis_score 边界
+        scores = Concept.objects.aggregate(low=Min('topsis_score'), high=Max('topsis_score'))
+        self.min_score = scores['low'] if scores['low'] is not None else 0
+        self.max_score = scores['high'] if scores['high'] is not None else 1e-5
 
-        # 获取所有normalized_weight用于归一化
-        all_weights = CourseConcept.objects.values_list('normalized_weight', flat=True)
-        self.min_weight = min(all_weights) if all_weights else 0
-        self.max_weight = max(all_weights) if all_weights else 1e-5
+        # normalized_weight 边界
+        weights = CourseConcept.objects.aggregate(low=Min('normalized_weight'), high=Max('normalized_weight'))
+        self.min_weight = weights['low'] if weights['low'] is not None else 0
+        self.max_weight = weights['high'] if weights['high'] is not None else 1e-5
 
     def _normalize(self, value, min_val, max_val):
         """Min-Max归一化"""
@@ -42,103 +66,125 @@ class KnowledgeGraphBuilder:
         return (value - min_val) / (max_val - min_val)
 
     def _add_concepts(self):
-        """批量添加概念节点（优化查询）"""
-        concepts = Concept.objects.defer('explanation').iterator()
-        for concept in concepts:
-            node_id = f"concept:{concept.id}"
-            self.node_mapping[node_id] = len(self.node_mapping)
-            self.graph.add_node(
-                self.node_mapping[node_id],
-                type='concept',
-                id=concept.id,
-                depth=concept.depth,
-                topsis_score=concept.topsis_score,
-                normalized=self._normalize(concept.topsis_score, self.min_score, self.max_score)
-            )
+        """批量添加概念节点（流式读取元组）"""
+        concepts = Concept.objects.values_list('id', 'depth', 'topsis_score').iterator()
+        for cid, depth, topsis_score in concepts:
+            self._add_concept_node(cid, depth, topsis_score)
+
+    def _add_concept_node(self, cid, depth, topsis_score):
+        node_id = f"concept:{cid}"
+        if node_id not in self.node_mapping:
+            self.node_mapping[node_id] = self._next_node_index()
+        self.graph.add_node(
+            self.node_mapping[node_id],
+            type='concept',
+            id=cid,
+            depth=depth,
+            topsis_score=topsis_score,
+            normalized=self._normalize(topsis_score, self.min_score, self.max_score)
+        )
+
+    def _next_node_index(self):
+        """新节点编号（增量更新删除节点后编号不再连续，不能用 len(node_mapping)）"""
+        index = self._next_index
+        self._next_index += 1
+        return index
 
     def _add_courses(self):
         """批量添加课程节点（优化内存）"""
-        course_ids = Course.objects.values_list('id', flat=True)
-        for cid in course_ids:
-            node_id = f"course:{cid}"
-            self.node_mapping[node_id] = len(self.node_mapping)
-            self.graph.add_node(self.node_mapping[node_id], type='course', id=cid)
+        courses = Course.objects.values_list('id', 'name').iterator()
+        for cid, name in courses:
+            self._add_course_node(cid, name)
+
+    def _add_course_node(self, cid, name):
+        node_id = f"course:{cid}"
+        if node_id not in self.node_mapping:
+            self.node_mapping[node_id] = self._next_node_index()
+        # 课程名称随图保存，路径后处理无需再逐个查库
+        self.graph.add_node(self.node_mapping[node_id], type='course', id=cid, name=name)
 
     def _add_prerequisite_edges(self):
         """优化后的先修关系边（归一化权重）"""
-        deps = PrerequisiteDependency.objects.select_related('prerequisite').values(
-            'prerequisite__topsis_score', 'prerequisite__id', 'target__id'
-        )
+        deps = PrerequisiteDependency.objects.values_list(
+            'prerequisite_id', 'target_id', 'prerequisite__topsis_score'
+        ).iterator()
 
-        for dep in deps:
-            src_id = f"concept:{dep['prerequisite__id']}"
-            dst_id = f"concept:{dep['target__id']}"
-            if src_id in self.node_mapping and dst_id in self.node_mapping:
-                # 归一化权重计算
-                raw_weight = dep['prerequisite__topsis_score']
-                norm_weight = self._normalize(raw_weight, self.min_score, self.max_score)
-                final_weight = (1 - norm_weight) * self.WEIGHT_SCALING_FACTOR  # 高分概念优先
-
-                self.graph.add_edge(
-                    self.node_mapping[src_id],
-                    self.node_mapping[dst_id],
-                    weight=final_weight,
-                    type='prerequisite'
-                )
+        for prerequisite_id, target_id, raw_weight in deps:
+            self._add_prerequisite_edge(prerequisite_id, target_id, raw_weight)
+
+    def _add_prerequisite_edge(self, prerequisite_id, target_id, raw_weight):
+        src_id = f"concept:{prerequisite_id}"
+        dst_id = f"concept:{target_id}"
+        if src_id in self.node_mapping and dst_id in self.node_mapping:
+            # 归一化权重计算
+            norm_weight = self._normalize(raw_weight, self.min_score, self.max_score)
+            final_weight = (1 - norm_weight) * self.WEIGHT_SCALING_FACTOR  # 高分概念优先
+
+            self.graph.add_edge(
+                self.node_mapping[src_id],
+                self.node_mapping[dst_id],
+                weight=final_weight,
+                type='prerequisite'
+            )
 
     def _add_course_concept_edges(self):
         """优化后的课程-概念边"""
-        relations = CourseConcept.objects.select_related('concept').only(
+        relations = CourseConcept.objects.values_list(
             'course_id', 'concept_id', 'normalized_weight'
         ).iterator()
 
-        for rel in relations:
-            course_id = f"course:{rel.course.id}"
-            concept_id = f"concept:{rel.concept.id}"
-            if course_id in self.node_mapping and concept_id in self.node_mapping:
-                # 归一化权重处理
-                norm_weight = self._normalize(
-                    rel.normalized_weight,
-                    self.min_weight,
-                    self.max_weight
-                ) * self.WEIGHT_SCALING_FACTOR
-
-                self.graph.add_edge(
-                    self.node_mapping[course_id],
-                    self.node_mapping[concept_id],
-                    weight=norm_weight,
-                    type='covers'
-                )
-                self.graph.add_edge(
-                    self.node_mapping[concept_id],
-                    self.node_mapping[course_id],
-                    weight=norm_weight * 1.5,  # 反向边权重更高
-                    type='covered_by'
-                )
+        for cid, concept_pk, normalized_weight in relations:
+            self._add_course_concept_edge(cid, concept_pk, normalized_weight)
+
+    def _add_course_concept_edge(self, cid, concept_pk, normalized_weight):
+        course_id = f"course:{cid}"
+        concept_id = f"concept:{concept_pk}"
+        if course_id in self.node_mapping and concept_id in self.node_mapping:
+            # 归一化权重处理
+            norm_weight = self._normalize(
+                normalized_weight,
+                self.min_weight,
+                self.max_weight
+            ) * self.WEIGHT_SCALING_FACTOR
+
+            self.graph.add_edge(
+                self.node_mapping[course_id],
+                self.node_mapping[concept_id],
+                weight=norm_weight,
+                type='covers'
+            )
+            self.graph.add_edge(
+                self.node_mapping[concept_id],
+                self.node_mapping[course_id],
+                weight=norm_weight * 1.5,  # 反向边权重更高
+                type='covered_by'
+            )
 
     def _add_course_prerequisites(self):
         """添加课程间先修关系（使用match_pre_courses）"""
-        course_map = {c.name: c.id for c in Course.objects.only('id', 'name')}
+        course_map = dict(Course.objects.values_list('name', 'id'))
 
-        for course in Course.objects.only('id', 'match_pre_courses'):
-            src_id = f"course:{course.id}"
-            if src_id not in self.node_mapping:
+        for cid, pre_names in Course.objects.values_list('id', 'match_pre_courses').iterator():
+            if f"course:{cid}" not in self.node_mapping:
                 continue
 
-            for pre_name in course.match_pre_courses:
+            for pre_name in pre_names:
                 pre_id = course_map.get(pre_name)
                 if not pre_id:
                     continue
+                self._add_course_prerequisite_edge(pre_id, cid)
 
-                dst_id = f"course:{pre_id}"
-                if dst_id in self.node_mapping:
-                    # 设置比概念边更低的权重（优先课程路径）
-                    self.graph.add_edge(
-                        self.node_mapping[dst_id],
-                        self.node_mapping[src_id],
-                        weight=0.01 * self.WEIGHT_SCALING_FACTOR,  # 课程路径优先
-                        type='course_prerequisite'
-                    )
+    def _add_course_prerequisite_edge(self, pre_id, cid):
+        src_id = f"course:{cid}"
+        dst_id = f"course:{pre_id}"
+        if src_id in self.node_mapping and dst_id in self.node_mapping:
+            # 设置比概念边更低的权重（优先课程路径）
+            self.graph.add_edge(
+                self.node_mapping[dst_id],
+                self.node_mapping[src_id],
+                weight=0.01 * self.WEIGHT_SCALING_FACTOR,  # 课程路径优先
+                type='course_prerequisite'
+            )
 
     @transaction.atomic
     def build(self):
@@ -148,14 +194,301 @@ class KnowledgeGraphBuilder:
         self._add_prerequisite_edges()
         self._add_course_concept_edges()
         self._add_course_prerequisites()
-
-        with open(self.GRAPH_PATH, 'wb') as f:
-            pickle.dump((self.graph, self.node_mapping), f)
+        self.graph.graph['normalization'] = self._normalization_bounds()
+        self._persist()
         logger.info(f"Graph built with {len(self.graph.nodes)} nodes and {len(self.graph.edges)} edges")
 
+    @transaction.atomic
+    def build_incremental(self, concept_ids=(), course_concepts=(), course_ids=(), search_indexes=True):
+        """按变更集增量更新已持久化的图谱并提升版本
+
+        concept_ids: 属性或先修依赖发生变化的概念ID
+        course_concepts: 发生变化的 (课程ID, 概念ID) 关系
+        course_ids: 名称或 match_pre_courses 发生变化（含新增/删除）的课程ID
+        search_indexes: 是否重建全图搜索加速索引（ALT地标表、收缩层次），见 _persist
+        归一化边界变化时所有边权都会改变，此时退回全量构建。
+        """
+        try:
+            self.graph, self.node_mapping = self.load_graph()
+        except FileNotFoundError:
+            logger.info("No persisted graph, falling back to full build")
+            return self.build()
+        if self.graph.graph.get('normalization') != self._normalization_bounds():
+            logger.info("Normalization bounds changed, falling back to full build")
+            self.graph, self.node_mapping = nx.DiGraph(), {}
+            self._next_index = 0
+            return self.build()
+
+        self._next_index = max(self.node_mapping.values(), default=-1) + 1
+        for cid in set(concept_ids):
+            self._patch_concept(cid)
+        self._patch_courses(set(course_ids))
+        for cid, concept_pk in set(map(tuple, course_concepts)):
+            self._patch_course_concept(cid, concept_pk)
+
+        self._persist(search_indexes=search_indexes)
+        logger.info(f"Graph patched: {len(set(concept_ids))} concepts, {len(set(course_ids))} courses, "
+                    f"{len(course_concepts)} course-concept relations")
+
+    def _remove_node(self, node_id):
+        index = self.node_mapping.pop(node_id, None)
+        if index is not None:
+            self.graph.remove_node(index)
+
+    def _remove_edges(self, edges, edge_types):
+        self.graph.remove_edges_from([
+            (u, v) for u, v, edge_type in list(edges) if edge_type in edge_types
+        ])
+
+    def _patch_concept(self, cid):
+        """刷新概念节点属性及其全部关联边"""
+        row = Concept.objects.filter(id=cid).values_list('depth', 'topsis_score').first()
+        if row is None:
+            self._remove_node(f"concept:{cid}")
+            return
+
+        self._add_concept_node(cid, *row)
+        node = self.node_mapping[f"concept:{cid}"]
+        self._remove_edges(self.graph.in_edges(node, data='type'), {'prerequisite', 'covers'})
+        self._remove_edges(self.graph.out_edges(node, data='type'), {'prerequisite', 'covered_by'})
+
+        deps = PrerequisiteDependency.objects.filter(
+            Q(prerequisite_id=cid) | Q(target_id=cid)
+        ).values_list('prerequisite_id', 'target_id', 'prerequisite__topsis_score')
+        for prerequisite_id, target_id, raw_weight in deps:
+            self._add_prerequisite_edge(prerequisite_id, target_id, raw_weight)
+
+        relations = CourseConcept.objects.filter(concept_id=cid).values_list('course_id', 'normalized_weight')
+        for course_id, normalized_weight in relations:
+            self._add_course_concept_edge(course_id, cid, normalized_weight)
+
+    def _patch_courses(self, course_ids):
+        """刷新课程节点及其入向课程先修边
+
+        新增、删除或改名的课程会改变其他课程 match_pre_courses 的名称解析结果，
+        这些引用方课程也一并刷新。
+        """
+        if not course_ids:
+            return
+        course_map = dict(Course.objects.values_list('name', 'id'))
+        rows = dict(
+            (cid, (name, pre_names))
+            for cid, name, pre_names in Course.objects.filter(id__in=course_ids).values_list(
+                'id', 'name', 'match_pre_courses'
+            )
+        )
+
+        affected_names = set()
+        for cid in course_ids:
+            node_id = f"course:{cid}"
+            old_name = self.graph.nodes[self.node_mapping[node_id]].get('name') \
+                if node_id in self.node_mapping else None
+            new_name = rows[cid][0] if cid in rows else None
+            if old_name != new_name:
+                affected_names.update(name for name in (old_name, new_name) if name)
+
+        if affected_names:
+            for cid, name, pre_names in Course.objects.values_list('id', 'name', 'match_pre_courses'):
+                if cid not in rows and affected_names.intersection(pre_names or []):
+                    rows[cid] = (name, pre_names)
+                    course_ids = course_ids | {cid}
+
+        new_courses = []
+        for cid in course_ids:
+            if cid not in rows:
+                self._remove_node(f"course:{cid}")
+                continue
+            if f"course:{cid}" not in self.node_mapping:
+                new_courses.append(cid)
+            self._add_course_node(cid, rows[cid][0])
+            node = self.node_mapping[f"course:{cid}"]
+            self._remove_edges(self.graph.in_edges(node, data='type'), {'course_prerequisite'})
+
+        # 节点全部就位后再连边，新增课程之间的先修关系也能解析
+        for cid in course_ids:
+            if cid not in rows:
+                continue
+            for pre_name in rows[cid][1] or []:
+                pre_id = course_map.get(pre_name)
+                if pre_id:
+                    self._add_course_prerequisite_edge(pre_id, cid)
+
+        # 新增课程补齐课程-概念边
+        relations = CourseConcept.objects.filter(course_id__in=new_courses).values_list(
+            'course_id', 'concept_id', 'normalized_weight'
+        )
+        for cid, concept_pk, normalized_weight in relations:
+            self._add_course_concept_edge(cid, concept_pk, normalized_weight)
+
+    def _patch_course_concept(self, cid, concept_pk):
+        course_node = self.node_mapping.get(f"course:{cid}")
+        concept_node = self.node_mapping.get(f"concept:{concept_pk}")
+        if course_node is None or concept_node is None:
+            return
+        for u, v in ((course_node, concept_node), (concept_node, course_node)):
+            if self.graph.has_edge(u, v):
+                self.graph.remove_edge(u, v)
+
+        row = CourseConcept.objects.filter(course_id=cid, concept_id=concept_pk).values_list(
+            'normalized_weight', flat=True
+        ).first()
+        if row is not None:
+            self._add_course_concept_edge(cid, concept_pk, row)
+
+    def _normalization_bounds(self):
+        return [self.min_score, self.max_score, self.min_weight, self.max_weight]
+
+    def _persist(self, search_indexes=True):
+        """写出图谱及全部派生数据到新的版本目录，再原子切换 CURRENT 指针
+
+        版本名 = 时间戳 + 图内容哈希；写入过程中读者始终看到旧版本的完整目录。
+        search_indexes=False 时同时跳过ALT地标表与收缩层次（PathFinder 退回深度启发/A*）。
+        """
+        payload = pickle.dumps((self.graph, self.node_mapping), protocol=pickle.HIGHEST_PROTOCOL)
+        version = f"{datetime.now().strftime('%Y%m%d%H%M%S%f')}-{hashlib.sha1(payload).hexdigest()[:12]}"
+        os.makedirs(self.SNAPSHOT_ROOT, exist_ok=True)
+        staging = os.path.join(self.SNAPSHOT_ROOT, f".staging-{version}")
+        os.makedirs(staging)
+
+        with open(os.path.join(staging, self.GRAPH_FILE), 'wb') as f:
+            f.write(payload)
+        CSRGraph.from_networkx(self.graph, self.node_mapping, meta={'version': version}).save(
+            os.path.join(staging, self.CSR_DIR)
+        )
+        popularity = dict(Course.objects.values_list('id', 'popularity'))
+        if search_indexes:
+            self._build_landmarks(version, popularity, staging)
+        course_ids = [data['id'] for _, data in self.graph.nodes(data=True) if data['type'] == 'course']
+        prerequisites = prerequisites_from_graph(self.graph)
+        self._build_cold_start(version, course_ids, prerequisites, popularity, staging)
+        self._build_course_closure(version, course_ids, prerequisites, staging)
+        if search_indexes and self.contraction:
+            self._build_contraction(version, staging)
+
+        self._warn_dropped_artifacts(version, staging)
+        os.replace(staging, self.snapshot_dir(version))
+        self._publish(version)
+        self._prune_snapshots()
+        return version
+
+    @classmethod
+    def _warn_dropped_artifacts(cls, version, directory):
+        """新版本缺少当前版本已有的派生文件时告警（查询会静默退化）"""
+        previous = cls.current_version()
+        if not previous or not os.path.isdir(cls.snapshot_dir(previous)):
+            return
+        dropped = sorted(set(os.listdir(cls.snapshot_dir(previous))) - set(os.listdir(directory)))
+        if dropped:
+            logger.warning(f"Snapshot {version} is published without {', '.join(dropped)} "
+                           f"(present in {previous})")
+
+    def _build_landmarks(self, version, popularity, directory):
+        """离线预计算ALT地标的正/反向最短距离"""
+        landmarks = select_landmarks(self.graph, self.LANDMARK_COUNT, popularity)
+        LandmarkIndex.build(self.graph, landmarks, version).save(os.path.join(directory, self.LANDMARKS_FILE))
+
+    def _build_cold_start(self, version, course_ids, prerequisites, popularity, directory):
+        """按图中的课程先修边预计算冷启动索引"""
+        ColdStartIndex.build(
+            course_ids, prerequisites, popularity, version=version
+        ).save(os.path.join(directory, self.COLD_START_FILE))
+
+    def _build_course_closure(self, version, course_ids, prerequisites, directory):
+        """预计算全部课程的传递先修闭包与拓扑层级"""
+        CourseClosureIndex.build(course_ids, prerequisites, version).save(
+            os.path.join(directory, self.COURSE_CLOSURE_FILE)
+        )
+
+    def _build_contraction(self, version, directory):
+        """预处理收缩层次覆盖图（边权含类型系数）；图规模超限时跳过，PathFinder 退回A*"""
+        if self.graph.number_of_nodes() > self.MAX_CONTRACTION_NODES:
+            logger.warning(f"Graph has {self.graph.number_of_nodes()} nodes (> {self.MAX_CONTRACTION_NODES}), "
+                           f"skipping contraction hierarchy")
+            return
+        ContractionHierarchy.build(self.graph, version).save(os.path.join(directory, self.CONTRACTION_FILE))
+
+    @classmethod
+    def _publish(cls, version):
+        """原子替换 CURRENT 指针"""
+        pointer = os.path.join(cls.SNAPSHOT_ROOT, cls.CURRENT_POINTER)
+        tmp_path = f"{pointer}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(version)
+        os.replace(tmp_path, pointer)
+        logger.info(f"Published knowledge graph snapshot {version}")
+
+    @classmethod
+    def list_snapshots(cls):
+        """按时间升序列出已发布的版本"""
+        if not os.path.isdir(cls.SNAPSHOT_ROOT):
+            return []
+        return sorted(
+            name for name in os.listdir(cls.SNAPSHOT_ROOT)
+            if not name.startswith('.') and os.path.isdir(os.path.join(cls.SNAPSHOT_ROOT, name))
+        )
+
+    @classmethod
+    def _prune_snapshots(cls):
+        """只保留最近 KEEP_SNAPSHOTS 个版本（当前版本永不删除）"""
+        current = cls.current_version()
+        for name in cls.list_snapshots()[:-cls.KEEP_SNAPSHOTS]:
+            if name == current:
+                continue
+            try:
+                shutil.rmtree(cls.snapshot_dir(name))
+            except OSError as e:
+                # 其他进程仍映射旧文件时（如Windows）删除会失败，下次构建再清理
+                logger.warning(f"Failed to remove snapshot {name}: {e}")
+
+    @classmethod
+    def rollback(cls, steps=1):
+        """CURRENT 回退到更早的版本，返回回退后的版本名"""
+        snapshots = cls.list_snapshots()
+        current = cls.current_version()
+        if current not in snapshots:
+            raise FileNotFoundError("No published snapshot to roll back from")
+        index = snapshots.index(current) - steps
+        if index < 0:
+            raise ValueError(f"Only {snapshots.index(current)} older snapshot(s) available")
+        cls._publish(snapshots[index])
+        return snapshots[index]
+
+    @classmethod
+    def current_version(cls):
+        """读取 CURRENT 指针（只读一个小文件，不触碰图数据）"""
+        try:
+            with open(os.path.join(cls.SNAPSHOT_ROOT, cls.CURRENT_POINTER)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    @classmethod
+    def snapshot_dir(cls, version=None):
+        version = version or cls.current_version()
+        if not version:
+            raise FileNotFoundError("Knowledge graph not built yet")
+        return os.path.join(cls.SNAPSHOT_ROOT, version)
+
     @classmethod
-    def load_graph(cls):
-        if not os.path.exists(cls.GRAPH_PATH):
+    def load_graph(cls, version=None):
+        path = os.path.join(cls.snapshot_dir(version), cls.GRAPH_FILE)
+        if not os.path.exists(path):
             raise FileNotFoundError("Knowledge graph not built yet")
-        with open(cls.GRAPH_PATH, 'rb') as f:
-            return pickle.load(f)
\ No newline at end of file
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+
+    @classmethod
+    def load_csr_graph(cls, version=None, mmap_mode='r'):
+        """加载CSR格式图谱，返回 (CSRGraph, node_mapping)"""
+        csr = CSRGraph.load(os.path.join(cls.snapshot_dir(version), cls.CSR_DIR), mmap_mode=mmap_mode)
+        return csr, csr.build_node_mapping()
+
+    @classmethod
+    def load_artifact(cls, filename, loader_cls, version=None):
+        """加载版本目录中的派生索引（LANDMARKS_FILE/COLD_START_FILE/COURSE_CLOSURE_FILE/CONTRACTION_FILE），
+        loader_cls 为对应的 LandmarkIndex/ColdStartIndex/CourseClosureIndex/ContractionHierarchy
+        """
+        path = os.path.join(cls.snapshot_dir(version), filename)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{filename} not built yet")
+        return loader_cls.load(path)
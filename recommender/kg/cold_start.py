@@ -0,0 +1,75 @@
+# recommender/kg/cold_start.py
+import json
+import logging
+from collections import defaultdict
+from recommender.models import Course
+
+logger = logging.getLogger(__name__)
+
+
+def prerequisites_from_graph(graph):
+    """从图谱的 course_prerequisite 边（先修 -> 课程）提取 {课程ID: [先修课程ID]}"""
+    prerequisites = defaultdict(list)
+    for u, v, edge_type in graph.edges(data='type'):
+        if edge_type == 'course_prerequisite':
+            prerequisites[graph.nodes[v]['id']].append(graph.nodes[u]['id'])
+    return prerequisites
+
+
+def prerequisites_from_database():
+    """直接从 match_pre_courses 解析先修关系（与图谱构建的名称匹配规则一致）"""
+    course_map = dict(Course.objects.values_list('name', 'id'))
+    prerequisites = defaultdict(list)
+    for cid, pre_names in Course.objects.values_list('id', 'match_pre_courses'):
+        for pre_name in pre_names or []:
+            pre_id = course_map.get(pre_name)
+            if pre_id:
+                prerequisites[cid].append(pre_id)
+    return prerequisites
+
+
+class ColdStartIndex:
+    """冷启动推荐索引：每门课程的传递先修闭包（含自身）按热度降序取前N
+
+    随知识图谱一同构建，请求时只做一次字典查找，不再依赖递归SQL
+    （原 WITH RECURSIVE ... = ANY(...) 写法仅适用于PostgreSQL）。
+    """
+
+    LIMIT = 5
+
+    def __init__(self, ranked, version=None):
+        self.ranked = ranked
+        self.version = version
+
+    @classmethod
+    def build(cls, course_ids, prerequisites, popularity, limit=LIMIT, version=None):
+        ranked = {}
+        for cid in course_ids:
+            closure = {cid}
+            stack = [cid]
+            while stack:
+                for pre_id in prerequisites.get(stack.pop(), ()):
+                    if pre_id not in closure:
+                        closure.add(pre_id)
+                        stack.append(pre_id)
+            ranked[cid] = sorted(closure, key=lambda x: popularity.get(x, 0), reverse=True)[:limit]
+        logger.info(f"Built cold-start index for {len(ranked)} courses")
+        return cls(ranked, version)
+
+    @classmethod
+    def from_database(cls, limit=LIMIT):
+        popularity = dict(Course.objects.values_list('id', 'popularity'))
+        return cls.build(popularity.keys(), prerequisites_from_database(), popularity, limit)
+
+    def save(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.version, 'ranked': self.ranked}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        return cls(data['ranked'], data.get('version'))
+
+    def lookup(self, course_id):
+        return list(self.ranked.get(course_id, []))
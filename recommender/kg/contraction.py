@@ -0,0 +1,302 @@
+# recommender/kg/contraction.py
+import heapq
+import logging
+import numpy as np
+from recommender.kg.landmarks import effective_weight
+
+logger = logging.getLogger(__name__)
+
+
+class _Contractor:
+    """构建期使用的可变工作图：按重要度逐个收缩节点并补充捷径边"""
+
+    WITNESS_SETTLE_LIMIT = 200  # 见证搜索最多确定的节点数（超出则保守地添加捷径）
+    WITNESS_HOP_LIMIT = 4  # 收缩时见证路径的最多边数
+    SIMULATION_HOP_LIMIT = 1  # 估算优先级时只做更浅的见证搜索
+
+    def __init__(self, graph):
+        self.out_edges = {n: {} for n in graph.nodes}
+        self.in_edges = {n: {} for n in graph.nodes}
+        for u, v, data in graph.edges(data=True):
+            weight = effective_weight(u, v, data)
+            self.out_edges[u][v] = (weight, -1)
+            self.in_edges[v][u] = weight
+        self.contracted_neighbors = dict.fromkeys(graph.nodes, 0)
+
+    def _witness_costs(self, source, skip, targets, limit, hop_limit):
+        """不经过 skip 的 source 出发有限Dijkstra：代价超过 limit、边数超过 hop_limit
+        或 targets 全部确定即停止（找不到见证只会多加捷径，不影响正确性）
+        """
+        dist = {source: 0.0}
+        frontier = [(0.0, 0, source)]
+        pending = set(targets)
+        settled = 0
+        while frontier and pending and settled < self.WITNESS_SETTLE_LIMIT:
+            cost, hops, node = heapq.heappop(frontier)
+            if cost > dist[node]:
+                continue
+            pending.discard(node)
+            settled += 1
+            if hops >= hop_limit:
+                continue
+            for neighbor, (weight, _) in self.out_edges[node].items():
+                new_cost = cost + weight
+                if neighbor == skip or new_cost > limit:
+                    continue
+                if new_cost < dist.get(neighbor, float('inf')):
+                    dist[neighbor] = new_cost
+                    heapq.heappush(frontier, (new_cost, hops + 1, neighbor))
+        return dist
+
+    def shortcuts(self, node, hop_limit=None):
+        """收缩 node 需要添加的捷径 [(u, w, 权重)]"""
+        hop_limit = hop_limit or self.WITNESS_HOP_LIMIT
+        result = []
+        outgoing = self.out_edges[node]
+        if not outgoing:
+            return result
+        max_out = max(weight for weight, _ in outgoing.values())
+        for u, in_weight in self.in_edges[node].items():
+            witness = self._witness_costs(u, node, outgoing.keys(), in_weight + max_out, hop_limit)
+            for w, (out_weight, _) in outgoing.items():
+                if w == u:
+                    continue
+                via = in_weight + out_weight
+                if witness.get(w, float('inf')) > via:
+                    result.append((u, w, via))
+        return result
+
+    def priority(self, node, shortcuts):
+        """边差（新增捷径数 - 删除边数）+ 已收缩邻居数，越小越先收缩"""
+        removed = len(self.in_edges[node]) + len(self.out_edges[node])
+        return len(shortcuts) - removed + self.contracted_neighbors[node]
+
+    def contract(self, node, shortcuts):
+        """收缩节点：写入捷径并把 node 从工作图中摘除"""
+        for u, w, weight in shortcuts:
+            existing = self.out_edges[u].get(w)
+            if existing is None or weight < existing[0]:
+                self.out_edges[u][w] = (weight, node)
+                self.in_edges[w][u] = weight
+        neighbors = set(self.in_edges[node]) | set(self.out_edges[node])
+        for u in self.in_edges[node]:
+            del self.out_edges[u][node]
+        for w in self.out_edges[node]:
+            del self.in_edges[w][node]
+        for neighbor in neighbors:
+            self.contracted_neighbors[neighbor] += 1
+
+
+class ContractionHierarchy:
+    """收缩层次（Contraction Hierarchies）覆盖图
+
+    rank[v]                      节点收缩次序（越大越重要）；未收缩的核心节点共享最高rank
+    up_*[up_offsets[u]:...]      u -> w 且 rank[w] > rank[u] 的边（正向搜索只向上走）
+    down_*[down_offsets[w]:...]  u -> w 且 rank[u] > rank[w] 的边，按 w 存放（反向搜索只向上走）
+    核心内部的边同时出现在 up/down 中。
+    middle = -1 表示原始边，否则为捷径所跨过的被收缩节点，用于展开路径。
+    边权含 EDGE_TYPE_FACTORS 类型系数，与 PathFinder._get_edge_weight 一致。
+
+    支持的图规模上限为 MAX_NODES 个节点。
+    """
+
+    CORE_DEGREE_PRODUCT = 64  # 入度×出度超过此值的节点不再收缩，留在核心
+    MAX_NODES = 20000  # 建议的最大图规模
+
+    def __init__(self, rank, up_offsets, up_targets, up_weights, up_middle,
+                 down_offsets, down_sources, down_weights, down_middle, version=None):
+        self.rank = rank
+        self.up_offsets = up_offsets
+        self.up_targets = up_targets
+        self.up_weights = up_weights
+        self.up_middle = up_middle
+        self.down_offsets = down_offsets
+        self.down_sources = down_sources
+        self.down_weights = down_weights
+        self.down_middle = down_middle
+        self.version = version
+        self._middle = {}
+        for offsets, nodes, middle, upward in (
+            (up_offsets, up_targets, up_middle, True),
+            (down_offsets, down_sources, down_middle, False),
+        ):
+            counts = np.diff(offsets)
+            keys = np.repeat(np.arange(len(counts)), counts)
+            shortcut = middle >= 0
+            for key, node, mid in zip(keys[shortcut].tolist(), nodes[shortcut].tolist(), middle[shortcut].tolist()):
+                self._middle[(key, node) if upward else (node, key)] = mid
+        # 查询热路径上使用Python列表，避免逐元素访问NumPy标量
+        self._up = self._adjacency(up_offsets, up_targets, up_weights)
+        self._down = self._adjacency(down_offsets, down_sources, down_weights)
+
+    @staticmethod
+    def _adjacency(offsets, nodes, weights):
+        nodes = nodes.tolist()
+        weights = weights.tolist()
+        offsets = offsets.tolist()
+        return [
+            list(zip(nodes[offsets[u]:offsets[u + 1]], weights[offsets[u]:offsets[u + 1]]))
+            for u in range(len(offsets) - 1)
+        ]
+
+    @classmethod
+    def build(cls, graph, version=None):
+        num_nodes = max(graph.nodes, default=-1) + 1
+        contractor = _Contractor(graph)
+        simulate = contractor.SIMULATION_HOP_LIMIT
+        queue = [(contractor.priority(n, contractor.shortcuts(n, simulate)), n) for n in graph.nodes]
+        heapq.heapify(queue)
+
+        rank = np.full(num_nodes, -1, dtype=np.int32)
+        edges = []  # 收缩时 node 的全部剩余边即为其在层次中的最终边
+        core = []
+        order = 0
+        while queue:
+            _, node = heapq.heappop(queue)
+            if rank[node] >= 0:
+                continue
+            # 惰性更新：用浅层模拟重新估算优先级，若已不是最小则放回；确定收缩时才做完整见证搜索
+            priority = contractor.priority(node, contractor.shortcuts(node, simulate))
+            if queue and priority > queue[0][0]:
+                heapq.heappush(queue, (priority, node))
+                continue
+            rank[node] = order
+            order += 1
+            if len(contractor.in_edges[node]) * len(contractor.out_edges[node]) > cls.CORE_DEGREE_PRODUCT:
+                # 剩余图已过密：收缩它只会继续加密，留在核心中不再收缩
+                core.append(node)
+                continue
+            edges.extend((node, w, weight, middle) for w, (weight, middle) in contractor.out_edges[node].items())
+            edges.extend(
+                (u, node, weight, contractor.out_edges[u][node][1])
+                for u, weight in contractor.in_edges[node].items()
+            )
+            contractor.contract(node, contractor.shortcuts(node))
+
+        # 核心节点排在所有已收缩节点之上；核心内部的边两侧搜索都可走（核心内退化为普通双向Dijkstra）
+        core_rank = order
+        rank[core] = core_rank
+        core_edges = [
+            (u, w, weight, middle) for u in core for w, (weight, middle) in contractor.out_edges[u].items()
+        ]
+        up = [(u, w, weight, middle) for u, w, weight, middle in edges if rank[w] > rank[u]]
+        down = [(w, u, weight, middle) for u, w, weight, middle in edges if rank[u] > rank[w]]
+        up.extend(core_edges)
+        down.extend((w, u, weight, middle) for u, w, weight, middle in core_edges)
+        up_offsets, up_targets, up_weights, up_middle = cls._pack(up, num_nodes)
+        down_offsets, down_sources, down_weights, down_middle = cls._pack(down, num_nodes)
+        shortcuts = sum(1 for *_, middle in edges + core_edges if middle >= 0)
+        logger.info(f"Built contraction hierarchy: {len(edges) + len(core_edges)} edges ({shortcuts} shortcuts) "
+                    f"over {order - len(core)} contracted nodes, core {len(core)} nodes")
+        return cls(rank, up_offsets, up_targets, up_weights, up_middle,
+                   down_offsets, down_sources, down_weights, down_middle, version)
+
+    @staticmethod
+    def _pack(edges, num_nodes):
+        """[(键节点, 邻居, 权重, middle)] -> 按键节点分组的CSR数组"""
+        edges.sort(key=lambda e: (e[0], e[1]))
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        if edges:
+            np.add.at(offsets, np.array([e[0] for e in edges]) + 1, 1)
+        np.cumsum(offsets, out=offsets)
+        neighbors = np.array([e[1] for e in edges], dtype=np.int32)
+        weights = np.array([e[2] for e in edges], dtype=np.float64)
+        middle = np.array([e[3] for e in edges], dtype=np.int32)
+        return offsets, neighbors, weights, middle
+
+    def save(self, path):
+        np.savez(
+            path,
+            rank=self.rank,
+            up_offsets=self.up_offsets,
+            up_targets=self.up_targets,
+            up_weights=self.up_weights,
+            up_middle=self.up_middle,
+            down_offsets=self.down_offsets,
+            down_sources=self.down_sources,
+            down_weights=self.down_weights,
+            down_middle=self.down_middle,
+            version=np.array(self.version or ''),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['rank'],
+                data['up_offsets'],
+                data['up_targets'],
+                data['up_weights'],
+                data['up_middle'],
+                data['down_offsets'],
+                data['down_sources'],
+                data['down_weights'],
+                data['down_middle'],
+                str(data['version']) or None,
+            )
+
+    def query(self, start_nodes, target_node):
+        """多源双向向上搜索，返回 (最短代价, 展开后的原图节点路径, 扩展节点数)
+
+        不可达时路径为 None。
+        """
+        forward = {node: 0.0 for node in start_nodes}
+        backward = {target_node: 0.0}
+        forward_parent = dict.fromkeys(forward)
+        backward_parent = {target_node: None}
+        queues = ([(0.0, node) for node in forward], [(0.0, target_node)])
+        heapq.heapify(queues[0])
+        sides = ((forward, forward_parent, self._up, backward), (backward, backward_parent, self._down, forward))
+
+        best_cost = forward.get(target_node, float('inf'))
+        meeting = target_node if target_node in forward else None
+        expansions = 0
+        while True:
+            # 交替推进堆顶较小的一侧；两侧堆顶都不小于已知最优时结束
+            heads = [queue[0][0] if queue else float('inf') for queue in queues]
+            side = 0 if heads[0] <= heads[1] else 1
+            if heads[side] >= best_cost:
+                break
+            dist, parent, adjacency, other = sides[side]
+            cost, node = heapq.heappop(queues[side])
+            if cost > dist[node]:
+                continue
+            expansions += 1
+            if node in other and cost + other[node] < best_cost:
+                best_cost = cost + other[node]
+                meeting = node
+            for neighbor, weight in adjacency[node]:
+                new_cost = cost + weight
+                if new_cost < dist.get(neighbor, float('inf')):
+                    dist[neighbor] = new_cost
+                    parent[neighbor] = node
+                    heapq.heappush(queues[side], (new_cost, neighbor))
+
+        if meeting is None:
+            return float('inf'), None, expansions
+        up_path = []
+        node = meeting
+        while node is not None:
+            up_path.append(node)
+            node = forward_parent[node]
+        up_path.reverse()
+        node = backward_parent[meeting]
+        while node is not None:
+            up_path.append(node)
+            node = backward_parent[node]
+        return best_cost, self._unpack(up_path), expansions
+
+    def _unpack(self, path):
+        """把覆盖图路径中的捷径递归展开为原图边"""
+        result = [path[0]]
+        for u, w in zip(path, path[1:]):
+            stack = [(u, w)]
+            while stack:
+                a, b = stack.pop()
+                middle = self._middle.get((a, b))
+                if middle is None:
+                    result.append(b)
+                else:
+                    stack.append((middle, b))
+                    stack.append((a, middle))
+        return result
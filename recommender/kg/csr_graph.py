@@ -0,0 +1,297 @@
+# recommender/kg/csr_graph.py
+import json
+import os
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 节点/边类型编码（数组中只存整数码）
+NODE_TYPES = ('concept', 'course')
+EDGE_TYPES = ('prerequisite', 'covers', 'covered_by', 'course_prerequisite')
+NODE_TYPE_CODES = {name: code for code, name in enumerate(NODE_TYPES)}
+EDGE_TYPE_CODES = {name: code for code, name in enumerate(EDGE_TYPES)}
+
+# 路径搜索时的动态边权系数（强化课程先修边，弱化反向边）
+EDGE_TYPE_FACTORS = {'course_prerequisite': 0.8, 'covered_by': 1.2}
+
+
+class CSRGraph:
+    """基于NumPy数组的紧凑知识图谱（CSR邻接 + 节点属性数组）
+
+    语义与 KnowledgeGraphBuilder 生成的 nx.DiGraph 完全一致：
+    节点整数编号即 node_mapping 中的值，边按 (src, dst) 去重（后写覆盖）。
+    每个数组单独保存为 .npy，加载时可使用 mmap_mode，多进程共享同一份页缓存。
+    """
+
+    ARRAY_NAMES = (
+        'offsets', 'targets', 'weights', 'edge_types',
+        'node_types', 'depth', 'topsis_score', 'normalized', 'node_ids', 'names',
+        'effective_weights',
+    )
+    META_FILE = 'meta.json'
+
+    def __init__(self, offsets, targets, weights, edge_types,
+                 node_types, depth, topsis_score, normalized, node_ids, names, meta=None,
+                 effective_weights=None):
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.edge_types = edge_types
+        # 含 EDGE_TYPE_FACTORS 类型系数的边权（搜索热路径读取），构建时写出以便mmap共享
+        if effective_weights is None:
+            effective_weights = self.effective_edge_weights(weights, edge_types)
+        self.effective_weights = effective_weights
+        self.node_types = node_types
+        self.depth = depth
+        self.topsis_score = topsis_score
+        self.normalized = normalized
+        self.node_ids = node_ids
+        self.names = names  # 课程名称（概念节点为空串）
+        self.meta = meta or {}
+
+    @staticmethod
+    def effective_edge_weights(weights, edge_types):
+        factors = np.array([EDGE_TYPE_FACTORS.get(name, 1.0) for name in EDGE_TYPES])
+        return np.asarray(weights) * factors[np.asarray(edge_types)]
+
+    @property
+    def num_nodes(self):
+        return len(self.node_types)
+
+    @property
+    def num_edges(self):
+        return len(self.targets)
+
+    @classmethod
+    def from_edges(cls, node_ids, node_types, depth, topsis_score, normalized, names,
+                   src, dst, weights, edge_types, meta=None):
+        """由节点属性数组和边列表构建CSR（重复边保留最后一次写入，与DiGraph.add_edge一致）"""
+        num_nodes = len(node_ids)
+        src = np.asarray(src, dtype=np.int64)
+        dst = np.asarray(dst, dtype=np.int64)
+        weights = np.asarray(weights, dtype=np.float64)
+        edge_types = np.asarray(edge_types, dtype=np.int8)
+
+        # 反转后取首次出现 => 原序列中最后一次写入；np.unique 同时按 (src, dst) 排序
+        keys = src * max(num_nodes, 1) + dst
+        _, rev_idx = np.unique(keys[::-1], return_index=True)
+        keep = len(keys) - 1 - rev_idx
+
+        src, dst = src[keep], dst[keep]
+        offsets = np.zeros(num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(src, minlength=num_nodes), out=offsets[1:])
+
+        return cls(
+            offsets=offsets,
+            targets=dst.astype(np.int32),
+            weights=weights[keep],
+            edge_types=edge_types[keep],
+            node_types=np.asarray(node_types, dtype=np.int8),
+            depth=np.asarray(depth, dtype=np.int32),
+            topsis_score=np.asarray(topsis_score, dtype=np.float64),
+            normalized=np.asarray(normalized, dtype=np.float64),
+            node_ids=np.asarray(node_ids, dtype=str),
+            names=np.asarray(names, dtype=str),
+            meta=meta,
+        )
+
+    @classmethod
+    def from_networkx(cls, graph, node_mapping, meta=None):
+        """从 (nx.DiGraph, node_mapping) 转换"""
+        num_nodes = max(node_mapping.values(), default=-1) + 1
+        node_ids = [''] * num_nodes
+        for key, idx in node_mapping.items():
+            node_ids[idx] = key
+
+        node_types = np.full(num_nodes, -1, dtype=np.int8)
+        depth = np.zeros(num_nodes, dtype=np.int32)
+        topsis_score = np.full(num_nodes, np.nan)
+        normalized = np.full(num_nodes, np.nan)
+        names = [''] * num_nodes
+        for n, data in graph.nodes(data=True):
+            node_types[n] = NODE_TYPE_CODES[data['type']]
+            depth[n] = data.get('depth', 0)
+            topsis_score[n] = data.get('topsis_score', np.nan)
+            normalized[n] = data.get('normalized', np.nan)
+            names[n] = data.get('name', '')
+
+        src, dst, weights, edge_types = [], [], [], []
+        for u, v, data in graph.edges(data=True):
+            src.append(u)
+            dst.append(v)
+            weights.append(data['weight'])
+            edge_types.append(EDGE_TYPE_CODES[data['type']])
+
+        return cls.from_edges(
+            node_ids, node_types, depth, topsis_score, normalized, names,
+            src, dst, weights, edge_types, meta=meta
+        )
+
+    def save(self, directory):
+        """每个数组保存为独立的 .npy（.npz 不支持 mmap）"""
+        os.makedirs(directory, exist_ok=True)
+        for name in self.ARRAY_NAMES:
+            np.save(os.path.join(directory, f'{name}.npy'), getattr(self, name))
+
+        meta = dict(self.meta)
+        meta.update(
+            num_nodes=self.num_nodes,
+            num_edges=self.num_edges,
+            node_types=list(NODE_TYPES),
+            edge_types=list(EDGE_TYPES),
+        )
+        with open(os.path.join(directory, self.META_FILE), 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        logger.info(f"CSR graph saved to {directory}: {self.num_nodes} nodes, {self.num_edges} edges")
+
+    @classmethod
+    def load(cls, directory, mmap_mode='r'):
+        if not os.path.exists(os.path.join(directory, cls.META_FILE)):
+            raise FileNotFoundError("CSR knowledge graph not built yet")
+        with open(os.path.join(directory, cls.META_FILE), encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays = {
+            name: np.load(os.path.join(directory, f'{name}.npy'), mmap_mode=mmap_mode)
+            for name in cls.ARRAY_NAMES
+            if os.path.exists(os.path.join(directory, f'{name}.npy'))  # 旧版本快照无 effective_weights
+        }
+        return cls(meta=meta, **arrays)
+
+    def build_node_mapping(self):
+        """重建 'type:id' -> 整数编号 的映射"""
+        return {key: idx for idx, key in enumerate(self.node_ids.tolist()) if key}
+
+
+class CSRGraphAdapter:
+    """为 PathFinder 提供的 NetworkX 风格只读视图
+
+    仅实现 PathFinder 用到的接口：graph.nodes[n]、graph[u][v]、graph.neighbors(u)、graph.predecessors(v)。
+    graph.nodes[n] / graph[u][v] 每次访问都要构造字典，搜索热路径应改用
+    weighted_neighbors / edge_weight / node_type / node_depth / node_id 直接读数组。
+    """
+
+    def __init__(self, csr):
+        self.csr = csr
+        self.nodes = _NodeView(csr)
+        self._reverse = None  # 反向CSR (offsets, sources)，首次反向搜索时构建
+
+    def __getitem__(self, u):
+        return _AdjacencyView(self.csr, u)
+
+    def __len__(self):
+        return self.csr.num_nodes
+
+    def __contains__(self, n):
+        return 0 <= n < self.csr.num_nodes and self.csr.node_types[n] >= 0
+
+    def neighbors(self, u):
+        start, end = self.csr.offsets[u], self.csr.offsets[u + 1]
+        return iter(self.csr.targets[start:end].tolist())
+
+    def weighted_neighbors(self, u):
+        """u 的 (邻居, 含类型系数的边权) 序列，直接取自CSR切片"""
+        start, end = self.csr.offsets[u:u + 2].tolist()
+        return zip(self.csr.targets[start:end].tolist(), self.csr.effective_weights[start:end].tolist())
+
+    def edge_weight(self, u, v):
+        """u -> v 含类型系数的边权；边不存在时抛出 KeyError"""
+        start, end = self.csr.offsets[u:u + 2].tolist()
+        pos = start + int(np.searchsorted(self.csr.targets[start:end], v))
+        if pos >= end or self.csr.targets[pos] != v:
+            raise KeyError(v)
+        return float(self.csr.effective_weights[pos])
+
+    def node_type(self, n):
+        return NODE_TYPES[self.csr.node_types[n]]
+
+    def node_depth(self, n):
+        return int(self.csr.depth[n])
+
+    def node_id(self, n):
+        return str(self.csr.node_ids[n]).split(':', 1)[1]
+
+    def predecessors(self, v):
+        if self._reverse is None:
+            self._reverse = self._build_reverse()
+        offsets, sources = self._reverse
+        return iter(sources[offsets[v]:offsets[v + 1]].tolist())
+
+    def _build_reverse(self):
+        """按目标节点重新分组的反向邻接（源节点在各组内升序）"""
+        csr = self.csr
+        sources = np.repeat(np.arange(csr.num_nodes, dtype=np.int32), np.diff(csr.offsets))
+        order = np.argsort(csr.targets, kind='stable')
+        offsets = np.zeros(csr.num_nodes + 1, dtype=np.int64)
+        np.cumsum(np.bincount(csr.targets, minlength=csr.num_nodes), out=offsets[1:])
+        return offsets, sources[order]
+
+    def number_of_nodes(self):
+        return int(np.count_nonzero(np.asarray(self.csr.node_types) >= 0))
+
+    def number_of_edges(self):
+        return self.csr.num_edges
+
+
+class _NodeView:
+    def __init__(self, csr):
+        self.csr = csr
+
+    def __len__(self):
+        return self.csr.num_nodes
+
+    def __iter__(self):
+        return iter(np.flatnonzero(np.asarray(self.csr.node_types) >= 0).tolist())
+
+    def __call__(self, data=False, default=None):
+        """兼容 graph.nodes(data=...) 的迭代方式"""
+        if data is False:
+            return iter(self)
+        if data is True:
+            return ((n, self[n]) for n in self)
+        return ((n, self[n].get(data, default)) for n in self)
+
+    def __getitem__(self, n):
+        csr = self.csr
+        node_type = NODE_TYPES[csr.node_types[n]]
+        data = {'type': node_type, 'id': str(csr.node_ids[n]).split(':', 1)[1]}
+        if node_type == 'concept':
+            data.update(
+                depth=int(csr.depth[n]),
+                topsis_score=float(csr.topsis_score[n]),
+                normalized=float(csr.normalized[n]),
+            )
+        else:
+            data['name'] = str(csr.names[n])
+        return data
+
+
+class _AdjacencyView:
+    def __init__(self, csr, u):
+        self.csr = csr
+        self.start, self.end = int(csr.offsets[u]), int(csr.offsets[u + 1])
+
+    def __iter__(self):
+        return iter(self.csr.targets[self.start:self.end].tolist())
+
+    def __len__(self):
+        return self.end - self.start
+
+    def _find(self, v):
+        targets = self.csr.targets[self.start:self.end]
+        pos = int(np.searchsorted(targets, v))
+        if pos < len(targets) and targets[pos] == v:
+            return self.start + pos
+        return None
+
+    def __contains__(self, v):
+        return self._find(v) is not None
+
+    def __getitem__(self, v):
+        idx = self._find(v)
+        if idx is None:
+            raise KeyError(v)
+        return {
+            'weight': float(self.csr.weights[idx]),
+            'type': EDGE_TYPES[self.csr.edge_types[idx]],
+        }
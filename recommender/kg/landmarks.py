@@ -0,0 +1,102 @@
+# recommender/kg/landmarks.py
+import logging
+import numpy as np
+import networkx as nx
+from recommender.kg.csr_graph import EDGE_TYPE_FACTORS
+
+logger = logging.getLogger(__name__)
+
+
+def effective_weight(u, v, data):
+    """与 PathFinder._get_edge_weight 一致的边权（含类型系数）"""
+    return data['weight'] * EDGE_TYPE_FACTORS.get(data['type'], 1.0)
+
+
+def select_landmarks(graph, k, course_popularity=None):
+    """选取K个地标：一半取topsis_score最高的概念，一半取最热门的课程"""
+    concepts = []
+    courses = []
+    course_popularity = course_popularity or {}
+    for n, data in graph.nodes(data=True):
+        if data['type'] == 'concept':
+            concepts.append((data.get('topsis_score', 0), n))
+        else:
+            courses.append((course_popularity.get(data['id'], 0), n))
+
+    num_courses = min(k // 2, len(courses))
+    num_concepts = min(k - num_courses, len(concepts))
+    concepts.sort(reverse=True)
+    courses.sort(reverse=True)
+    return [n for _, n in concepts[:num_concepts]] + [n for _, n in courses[:num_courses]]
+
+
+class LandmarkIndex:
+    """ALT（A*, Landmarks, Triangle inequality）地标距离表
+
+    forward[k, v]  = d(L_k, v)   地标到各节点的最短距离
+    backward[k, v] = d(v, L_k)   各节点到地标的最短距离
+    由三角不等式得到 d(v, t) 的下界：
+        max_k max(d(L_k, t) - d(L_k, v), d(v, L_k) - d(t, L_k))
+    """
+
+    def __init__(self, landmarks, forward, backward, version=None):
+        self.landmarks = np.asarray(landmarks, dtype=np.int64)
+        self.forward = forward
+        self.backward = backward
+        self.version = version
+
+    @classmethod
+    def build(cls, graph, landmarks, version=None):
+        num_nodes = max(graph.nodes, default=-1) + 1
+        forward = np.full((len(landmarks), num_nodes), np.inf)
+        backward = np.full((len(landmarks), num_nodes), np.inf)
+        reverse = graph.reverse(copy=False)
+
+        for i, landmark in enumerate(landmarks):
+            for n, dist in nx.single_source_dijkstra_path_length(graph, landmark, weight=effective_weight).items():
+                forward[i, n] = dist
+            for n, dist in nx.single_source_dijkstra_path_length(reverse, landmark, weight=effective_weight).items():
+                backward[i, n] = dist
+
+        logger.info(f"Computed landmark distances for {len(landmarks)} landmarks over {num_nodes} nodes")
+        return cls(landmarks, forward, backward, version)
+
+    def save(self, path):
+        np.savez(
+            path,
+            landmarks=self.landmarks,
+            forward=self.forward,
+            backward=self.backward,
+            version=np.array(self.version or ''),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(
+                data['landmarks'],
+                data['forward'],
+                data['backward'],
+                str(data['version']) or None,
+            )
+
+    def heuristic_for(self, target_node):
+        """返回针对固定目标的下界函数 h(v)；v 无法到达目标时返回 inf"""
+        forward_t = self.forward[:, target_node]
+        backward_t = self.backward[:, target_node]
+        forward = self.forward
+        backward = self.backward
+
+        def heuristic(node):
+            with np.errstate(invalid='ignore'):
+                bounds = np.concatenate((
+                    forward_t - forward[:, node],
+                    backward[:, node] - backward_t,
+                ))
+            # inf - inf 为 nan（地标与两端都不连通，无信息），fmax 会忽略 nan
+            bound = np.fmax.reduce(bounds)
+            if np.isnan(bound) or bound < 0:
+                return 0.0
+            return float(bound)
+
+        return heuristic
@@ -0,0 +1,117 @@
+# recommender/kg/registry.py
+import threading
+import time
+import logging
+from types import MappingProxyType
+import networkx as nx
+from recommender.kg.build_kg import KnowledgeGraphBuilder
+from recommender.kg.csr_graph import CSRGraphAdapter
+
+logger = logging.getLogger(__name__)
+
+
+class GraphHandle:
+    """一次加载得到的只读图谱快照（各请求共享同一引用）"""
+
+    __slots__ = ('graph', 'node_mapping', 'reverse_mapping', 'version', 'backend', '_artifacts')
+
+    def __init__(self, graph, node_mapping, version, backend):
+        self.graph = graph
+        self.node_mapping = MappingProxyType(node_mapping)
+        self.reverse_mapping = MappingProxyType({v: k for k, v in node_mapping.items()})
+        self.version = version
+        self.backend = backend
+        self._artifacts = {}
+
+    def get_artifact(self, name, loader):
+        """按需加载与本版本图谱配套的附属数据（地标表等），每个句柄只加载一次"""
+        if name not in self._artifacts:
+            self._artifacts[name] = loader()
+        return self._artifacts[name]
+
+
+class GraphRegistry:
+    """进程级图谱注册表
+
+    每个进程只加载一次图谱；通过 CURRENT 版本指针（而非重新读取图文件）检测新构建或回滚。
+    检测到新版本时只由第一个发现的线程在锁外加载新句柄，其余请求继续使用旧句柄，
+    加载完成后整体替换句柄引用；只有首次加载（尚无旧句柄）时才需要等待。
+    """
+
+    CHECK_INTERVAL = 1.0  # 版本指针检查间隔（秒）
+
+    def __init__(self):
+        self._handles = {}
+        self._checked_at = {}
+        self._loading = {}  # 后端 -> 正在后台加载的版本
+        self._locks = {}  # 每个后端一把锁
+        self._locks_lock = threading.Lock()
+
+    def _lock_for(self, backend):
+        with self._locks_lock:
+            return self._locks.setdefault(backend, threading.Lock())
+
+    def get(self, backend='networkx'):
+        handle = self._handles.get(backend)
+        now = time.monotonic()
+        if handle is not None and now - self._checked_at.get(backend, 0) < self.CHECK_INTERVAL:
+            return handle
+
+        version = KnowledgeGraphBuilder.current_version()
+        if handle is not None and handle.version == version:
+            self._checked_at[backend] = now
+            return handle
+
+        lock = self._lock_for(backend)
+        if handle is None:
+            # 首次加载：没有旧句柄可用，只能等待
+            with lock:
+                handle = self._handles.get(backend)
+                if handle is None:
+                    handle = self._load(backend, version)
+                    self._handles[backend] = handle
+                self._checked_at[backend] = now
+            return handle
+
+        with lock:
+            if self._loading.get(backend) == version:
+                return handle  # 其他线程正在加载该版本，先用旧句柄
+            self._loading[backend] = version
+        try:
+            new_handle = self._load(backend, version)
+        except Exception:
+            with lock:
+                if self._loading.get(backend) == version:
+                    del self._loading[backend]
+            raise
+        with lock:
+            # 加载期间又发布了更新的版本时，由那次加载负责替换
+            if self._loading.get(backend) == version:
+                del self._loading[backend]
+                self._handles[backend] = new_handle  # 引用赋值即原子切换
+                self._checked_at[backend] = time.monotonic()
+        return new_handle
+
+    def _load(self, backend, version):
+        start = time.perf_counter()
+        if backend == 'csr':
+            csr, node_mapping = KnowledgeGraphBuilder.load_csr_graph(version)
+            graph = CSRGraphAdapter(csr)
+        else:
+            graph, node_mapping = KnowledgeGraphBuilder.load_graph(version)
+            graph = nx.freeze(graph)
+        logger.info(f"Loaded knowledge graph ({backend}, version {version}) in {time.perf_counter() - start:.2f}s")
+        return GraphHandle(graph, node_mapping, version, backend)
+
+    def publish(self):
+        """新图发布或回滚后调用：本进程下一次 get 立即检查版本指针"""
+        self._checked_at.clear()
+
+    def clear(self):
+        with self._locks_lock:
+            self._handles.clear()
+            self._checked_at.clear()
+            self._loading.clear()
+
+
+graph_registry = GraphRegistry()
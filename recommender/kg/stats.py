@@ -0,0 +1,124 @@
+# recommender/kg/stats.py
+import gc
+import random
+import time
+import tracemalloc
+import logging
+from collections import Counter, defaultdict
+import numpy as np
+import networkx as nx
+from recommender.kg.build_kg import KnowledgeGraphBuilder
+from recommender.kg.csr_graph import EDGE_TYPES
+
+logger = logging.getLogger(__name__)
+
+
+def _summary(values):
+    """数值分布摘要"""
+    if not len(values):
+        return {'count': 0}
+    values = np.asarray(values, dtype=np.float64)
+    return {
+        'count': int(len(values)),
+        'min': float(values.min()),
+        'mean': float(values.mean()),
+        'p50': float(np.percentile(values, 50)),
+        'p95': float(np.percentile(values, 95)),
+        'p99': float(np.percentile(values, 99)),
+        'max': float(values.max()),
+    }
+
+
+def _longest_chain(graph, edge_type):
+    """指定类型边构成的子图上的最长链（边数）；存在环时先缩点"""
+    subgraph = nx.DiGraph()
+    subgraph.add_edges_from((u, v) for u, v, t in graph.edges(data='type') if t == edge_type)
+    if not subgraph:
+        return 0
+    return nx.dag_longest_path_length(nx.condensation(subgraph))
+
+
+def collect_graph_stats(graph):
+    """结构统计：各类型节点/边数量、按边类型的出/入度分布、连通分量、最长先修链"""
+    node_types = Counter(t for _, t in graph.nodes(data='type'))
+    out_degrees = defaultdict(Counter)
+    in_degrees = defaultdict(Counter)
+    for u, v, edge_type in graph.edges(data='type'):
+        out_degrees[edge_type][u] += 1
+        in_degrees[edge_type][v] += 1
+
+    weak = [len(c) for c in nx.weakly_connected_components(graph)]
+    strong = [len(c) for c in nx.strongly_connected_components(graph)]
+
+    return {
+        'nodes': graph.number_of_nodes(),
+        'edges': graph.number_of_edges(),
+        'node_types': dict(node_types),
+        'edge_types': {t: sum(out_degrees[t].values()) for t in EDGE_TYPES},
+        # 只统计至少有一条该类型边的节点
+        'out_degree': {t: _summary(list(out_degrees[t].values())) for t in EDGE_TYPES},
+        'in_degree': {t: _summary(list(in_degrees[t].values())) for t in EDGE_TYPES},
+        'weakly_connected_components': {'count': len(weak), 'largest': max(weak, default=0)},
+        'strongly_connected_components': {'count': len(strong), 'largest': max(strong, default=0)},
+        'max_prerequisite_chain': _longest_chain(graph, 'prerequisite'),
+        'max_course_prerequisite_chain': _longest_chain(graph, 'course_prerequisite'),
+    }
+
+
+def _measure(loader):
+    """返回 (加载耗时秒, Python堆内存增量字节, 加载结果)"""
+    gc.collect()
+    start = time.perf_counter()
+    result = loader()
+    elapsed = time.perf_counter() - start
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = loader()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return elapsed, allocated, result
+
+
+def collect_load_stats(version=None):
+    """两种存储格式的加载耗时与内存占用"""
+    pickle_time, pickle_memory, _ = _measure(lambda: KnowledgeGraphBuilder.load_graph(version))
+    csr_time, csr_memory, (csr, _) = _measure(lambda: KnowledgeGraphBuilder.load_csr_graph(version))
+    array_bytes = sum(getattr(csr, name).nbytes for name in csr.ARRAY_NAMES)
+    return {
+        'networkx': {'load_seconds': pickle_time, 'heap_bytes': pickle_memory},
+        # mmap 数组不计入Python堆（由各进程共享的页缓存承载），单独列出
+        'csr': {'load_seconds': csr_time, 'heap_bytes': csr_memory, 'mmap_array_bytes': int(array_bytes)},
+    }
+
+
+def profile_path_queries(users, samples=100, seed=0, **finder_options):
+    """随机抽样 (用户, 目标课程) 计时 PathFinder 查询：延迟分位数与每次查询扩展节点数"""
+    from recommender.recommendations.graph_based.path_finder import PathFinder
+
+    finder = PathFinder(use_cache=False, **finder_options)
+    course_ids = [key.split(':', 1)[1] for key in finder.node_mapping if key.startswith('course:')]
+    users = list(users)
+    if not users or not course_ids:
+        return {'samples': 0}
+
+    rng = random.Random(seed)
+    latencies = []
+    expansions = []
+    for _ in range(samples):
+        user = rng.choice(users)
+        target_id = rng.choice(course_ids)
+        finder.target_course_id = target_id
+        finder._target_course = None
+        start = time.perf_counter()
+        finder.find_optimal_path(user)
+        latencies.append((time.perf_counter() - start) * 1000)
+        expansions.append(finder.last_expansions)
+
+    return {
+        'samples': samples,
+        'options': finder_options,
+        'latency_ms': _summary(latencies),
+        'expansions': _summary(expansions),
+    }
@@ -1,12 +1,16 @@
 # recommender/kg/transE.py
 import os
 import sys
+import argparse
 import django
 import torch
 import torch.nn as nn
+import torch.multiprocessing as mp
 import numpy as np
+import csv
 import time
-from torch.utils.data import Dataset, DataLoader
+import logging
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SubsetRandomSampler
 from tqdm import tqdm
 
 # 设置项目路径
@@ -19,20 +23,26 @@ django.setup()
 
 from recommender.kg.transE_data import RELATION_TYPES
 
+logger = logging.getLogger(__name__)
+
 
 class TransE(nn.Module):
-    def __init__(self, num_entities, num_relations, dim=128, margin=3.0):
+    def __init__(self, num_entities, num_relations, dim=128, margin=3.0, debug=False, sparse=False,
+                 entity_max_norm=None):
         super().__init__()
-        self.ent_emb = nn.Embedding(num_entities, dim)
-        self.rel_emb = nn.Embedding(num_relations, dim)
+        # sparse=True 时反向传播只产生本批涉及行的稀疏梯度；
+        # entity_max_norm 在查表时把本批取到的实体行重新缩放到范数上限内（只处理涉及的行）
+        self.ent_emb = nn.Embedding(num_entities, dim, sparse=sparse, max_norm=entity_max_norm)
+        self.rel_emb = nn.Embedding(num_relations, dim, sparse=sparse)
         nn.init.xavier_uniform_(self.ent_emb.weight)
         nn.init.xavier_uniform_(self.rel_emb.weight)
         self.margin = margin
+        self.debug = debug  # 开启后每批输出样本索引
 
     def forward(self, pos_h, pos_r, pos_t, neg_h, neg_t):
-        # 调试输出
-        print(f"调试 - 正样本关系索引: {pos_r[:5].tolist()}")  # 打印前5个样本的关系索引
-        print(f"调试 - 负样本关系索引: {neg_t[:5].tolist()}")
+        if self.debug:
+            print(f"调试 - 正样本关系索引: {pos_r[:5].tolist()}")  # 打印前5个样本的关系索引
+            print(f"调试 - 负样本尾实体索引: {neg_t[:5].tolist()}")
 
         pos_emb = self.ent_emb(pos_h) + self.rel_emb(pos_r) - self.ent_emb(pos_t)
         pos_score = torch.norm(pos_emb, p=1, dim=1)
@@ -44,47 +54,255 @@ class TransE(nn.Module):
 
 
 class KGDataset(Dataset):
-    def __init__(self, triples_file):
-        self.triples = np.loadtxt(triples_file, dtype=np.int32)
+    """按批取样的三元组数据集
+
+    配合 BatchSampler 使用：__getitem__ 接收一批下标，整批负样本由一次向量化采样得到，
+    直接返回可送入 TransE.forward 的 (pos_h, pos_r, pos_t, neg_h, neg_t)。
+    bernoulli=True 时按关系的 tph/hpt 统计决定替换头或尾（一对多关系更多替换头实体），
+    否则头尾各半。
+    """
+
+    def __init__(self, triples_file, bernoulli=False, debug=False):
+        self.triples = np.loadtxt(triples_file, dtype=np.int64).reshape(-1, 3)
 
-        # 严格验证
+        # 严格验证（加载时一次完成，训练循环中不再逐批检查）
         max_rel = np.max(self.triples[:, 2])
         if max_rel >= len(RELATION_TYPES):
             raise ValueError(f"数据文件损坏！检测到关系索引 {max_rel}，最大允许值 {len(RELATION_TYPES) - 1}")
 
-        # 调试输出
-        print("\n🔍 数据抽样检查:")
-        sample_indices = np.random.choice(len(self.triples), 5, replace=False)
-        for idx in sample_indices:
-            h, t, r = self.triples[idx]
-            print(f"样本 {idx}: 头实体={h}, 尾实体={t}, 关系={r}")
-
-        self.entities = np.unique(np.concatenate(
-            [self.triples[:, 0], self.triples[:, 1]]
-        ))
+        if debug:
+            print("\n🔍 数据抽样检查:")
+            sample_indices = np.random.choice(len(self.triples), min(5, len(self.triples)), replace=False)
+            for idx in sample_indices:
+                h, t, r = self.triples[idx]
+                print(f"样本 {idx}: 头实体={h}, 尾实体={t}, 关系={r}")
+
+        self.entities = torch.from_numpy(np.unique(self.triples[:, :2]))
+        # 文件列顺序为 h, t, r
+        self.heads = torch.from_numpy(self.triples[:, 0])
+        self.tails = torch.from_numpy(self.triples[:, 1])
+        self.relations = torch.from_numpy(self.triples[:, 2])
+        self.head_prob = torch.from_numpy(self._head_probabilities(bernoulli))
+
+    def _head_probabilities(self, bernoulli):
+        """每种关系替换头实体的概率"""
+        probs = np.full(len(RELATION_TYPES), 0.5)
+        if not bernoulli:
+            return probs
+        for r in np.unique(self.triples[:, 2]):
+            selected = self.triples[self.triples[:, 2] == r]
+            tails_per_head = len(selected) / len(np.unique(selected[:, 0]))
+            heads_per_tail = len(selected) / len(np.unique(selected[:, 1]))
+            probs[r] = tails_per_head / (tails_per_head + heads_per_tail)
+        return probs
 
     def __len__(self):
         return len(self.triples)
 
-    def __getitem__(self, idx):
-        h, t, r = self.triples[idx]
-        # 确保负样本不改变关系索引
-        if np.random.rand() < 0.5:
-            neg_h = np.random.choice(self.entities)
-            return torch.LongTensor([h, t, r]), torch.LongTensor([neg_h, t, r])
-        else:
-            neg_t = np.random.choice(self.entities)
-            return torch.LongTensor([h, t, r]), torch.LongTensor([h, neg_t, r])
-
+    def __getitem__(self, indices):
+        indices = torch.as_tensor(indices, dtype=torch.long)
+        pos_h, pos_t, pos_r = self.heads[indices], self.tails[indices], self.relations[indices]
+
+        # 整批一次采样：替换头或尾（负样本不改变关系）
+        corrupt_head = torch.rand(len(indices)) < self.head_prob[pos_r]
+        random_entities = self.entities[torch.randint(len(self.entities), (len(indices),))]
+        neg_h = torch.where(corrupt_head, random_entities, pos_h)
+        neg_t = torch.where(corrupt_head, pos_t, random_entities)
+        return pos_h, pos_r, pos_t, neg_h, neg_t
+
+
+def batch_loader(dataset, batch_size, shuffle=True, indices=None):
+    """按批下标取样的 DataLoader（batch_size=None 关闭逐样本整理）；indices 限定取样范围"""
+    if indices is not None:
+        sampler = SubsetRandomSampler(indices) if shuffle else indices
+    else:
+        sampler = RandomSampler(dataset) if shuffle else range(len(dataset))
+    return DataLoader(dataset, sampler=BatchSampler(sampler, batch_size, drop_last=False), batch_size=None)
+
+
+def split_indices(num_triples, valid_ratio, seed=0):
+    """固定种子划分训练/验证三元组下标"""
+    order = np.random.default_rng(seed).permutation(num_triples)
+    num_valid = int(num_triples * valid_ratio)
+    return np.sort(order[num_valid:]), np.sort(order[:num_valid])
+
+
+def save_checkpoint(path, epoch, model, opt, state):
+    """模型 + 优化器 + 早停状态；先写临时文件再原子替换，中途被杀不会留下半个文件"""
+    tmp_path = f"{path}.tmp"
+    torch.save({
+        'epoch': epoch,
+        'model': model.state_dict(),
+        'optimizer': opt.state_dict(),
+        'state': state,
+    }, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def export_embeddings(model, state, entity_dict, emb_file, mapping_file, rel_file):
+    """保存最终嵌入（有验证集时取验证损失最优的一轮）及与行号对应的实体映射"""
+    entity_emb = state.get('best_entity', model.ent_emb.weight.detach())
+    relation_emb = state.get('best_relation', model.rel_emb.weight.detach())
+    np.save(emb_file, entity_emb.cpu().numpy())
+    np.save(rel_file, relation_emb.cpu().numpy())
+    np.save(mapping_file, entity_dict)
+
+
+def warm_start(model, entity_dict, emb_file, mapping_file, rel_file):
+    """用上次训练的嵌入初始化：按实体键对齐（新增实体保留Xavier初始化），返回复用的实体数"""
+    if not (os.path.exists(emb_file) and os.path.exists(mapping_file)):
+        return 0
+    previous = np.load(emb_file)
+    previous_ids = np.load(mapping_file, allow_pickle=True).item()
+    if previous.shape[1] != model.ent_emb.embedding_dim:
+        logger.warning(f"Embedding dim changed ({previous.shape[1]} -> {model.ent_emb.embedding_dim}), skip warm start")
+        return 0
+    pairs = [(idx, previous_ids[key]) for key, idx in entity_dict.items()
+             if key in previous_ids and previous_ids[key] < len(previous)]
+    if not pairs:
+        return 0
+    new_rows, old_rows = map(list, zip(*pairs))
+    with torch.no_grad():
+        model.ent_emb.weight[new_rows] = torch.as_tensor(previous[old_rows], dtype=model.ent_emb.weight.dtype)
+        if os.path.exists(rel_file):
+            relations = np.load(rel_file)
+            if relations.shape == tuple(model.rel_emb.weight.shape):
+                model.rel_emb.weight.copy_(torch.as_tensor(relations))
+    return len(pairs)
+
+
+def _hogwild_worker(rank, model, opt, dataset, shard, batch_size, threads, seed, commands, results):
+    """Hogwild 工作进程：在共享内存中的参数上无锁训练自己的三元组分片"""
+    torch.set_num_threads(threads)
+    torch.manual_seed(seed + rank)
+    loader = batch_loader(dataset, batch_size, indices=shard)
+    while commands.get() is not None:
+        total_loss = 0
+        for batch in loader:
+            loss = model(*batch)
+            opt.zero_grad()
+            loss.backward()
+            opt.step()
+            total_loss += loss.item()
+        results.put((total_loss, len(loader)))
+
+
+class HogwildTrainer:
+    """多进程 Hogwild 训练：ent_emb/rel_emb 与优化器状态放入共享内存，
+    N 个工作进程各自消费一个训练三元组分片，稀疏梯度直接无锁写回共享参数。
+
+    主进程按轮下发指令、汇总损失，验证、检查点与遥测仍在主进程完成。
+    """
+
+    def __init__(self, model, opt, dataset, indices, batch_size, workers, threads_per_worker, seed=0):
+        model.share_memory()
+        if hasattr(opt, 'share_memory'):
+            opt.share_memory()  # Adagrad 累加量共享（SparseAdam 无法共享，train_transE 已拒绝该组合）
+        context = mp.get_context('spawn')
+        self.results = context.Queue()
+        self.commands = []
+        self.processes = []
+        for rank, shard in enumerate(np.array_split(indices, workers)):
+            commands = context.SimpleQueue()
+            process = context.Process(
+                target=_hogwild_worker,
+                args=(rank, model, opt, dataset, shard, batch_size, threads_per_worker, seed, commands, self.results),
+                daemon=True,
+            )
+            process.start()
+            self.commands.append(commands)
+            self.processes.append(process)
+
+    def run_epoch(self):
+        """所有工作进程各跑完一遍分片，返回 (损失总和, 批数)"""
+        for commands in self.commands:
+            commands.put(True)
+        total_loss = 0
+        num_batches = 0
+        for _ in self.processes:
+            loss, batches = self.results.get()
+            total_loss += loss
+            num_batches += batches
+        return total_loss, num_batches
+
+    def close(self):
+        for commands in self.commands:
+            commands.put(None)
+        for process in self.processes:
+            process.join()
+
+
+class TrainingTelemetry:
+    """训练遥测：每隔 interval 轮向CSV追加一行（吞吐、损失、嵌入范数统计、耗时）"""
+
+    FIELDS = (
+        'epoch', 'loss', 'triples_per_sec', 'epoch_seconds', 'elapsed_seconds',
+        'ent_norm_mean', 'ent_norm_min', 'ent_norm_max', 'rel_norm_mean',
+    )
 
-def train_transE():
+    def __init__(self, path, interval=1):
+        self.path = path
+        self.interval = max(1, interval)
+        self.start = time.time()
+        if path and not os.path.exists(path):
+            with open(path, 'w', newline='') as f:
+                csv.writer(f).writerow(self.FIELDS)
+
+    def on_epoch(self, epoch, model, loss, triples, seconds):
+        """epoch 从1开始计数；返回本次记录的指标（未到间隔时返回 None）"""
+        if epoch % self.interval:
+            return None
+        with torch.no_grad():
+            ent_norms = model.ent_emb.weight.norm(dim=1)
+            rel_norms = model.rel_emb.weight.norm(dim=1)
+        row = {
+            'epoch': epoch,
+            'loss': round(loss, 6),
+            'triples_per_sec': round(triples / seconds, 1) if seconds else 0.0,
+            'epoch_seconds': round(seconds, 3),
+            'elapsed_seconds': round(time.time() - self.start, 3),
+            'ent_norm_mean': round(ent_norms.mean().item(), 6),
+            'ent_norm_min': round(ent_norms.min().item(), 6),
+            'ent_norm_max': round(ent_norms.max().item(), 6),
+            'rel_norm_mean': round(rel_norms.mean().item(), 6),
+        }
+        logger.info(f"TransE epoch {epoch}: {row}")
+        if self.path:
+            with open(self.path, 'a', newline='') as f:
+                csv.DictWriter(f, self.FIELDS).writerow(row)
+        return row
+
+
+def train_transE(resume=False):
     config = {
         'batch_size': 4096,
         'dim': 128,
         'lr': 0.01,
         'epochs': 100,
-        'margin': 3.0
+        'margin': 3.0,
+        'bernoulli': False,  # 按关系的头/尾映射比例选择替换头或尾
+        'telemetry_file': 'transE_telemetry.csv',
+        'telemetry_interval': 1,  # 每N轮记录一次
+        'debug': False,  # 逐批输出调试信息
+        'valid_ratio': 0.05,  # 留出验证集比例（0为不做验证与早停）
+        'patience': 5,  # 验证损失连续N轮未改善则早停
+        'checkpoint_file': 'transE_checkpoint.pt',
+        'checkpoint_interval': 5,  # 每N轮保存检查点
+        'warm_start': True,  # 有上次训练结果时按实体对齐热启动
+        'workers': 1,  # >1 时启用多进程 Hogwild 训练（共享参数 + 稀疏梯度）
+        'threads_per_worker': 1,  # 每个工作进程的torch线程数，workers * threads 不宜超过物理核数
+        'sparse': False,  # 稀疏梯度：每步的计算与内存访问只与批大小相关，与实体总数无关
+        'optimizer': 'adagrad',  # 'adagrad'（支持稀疏梯度）或 'sparse_adam'（要求稀疏梯度，仅限 workers=1）
+        'entity_max_norm': None  # 实体嵌入范数上限（如1.0），每批只约束涉及的行
     }
+    if config['optimizer'] == 'sparse_adam' and config['workers'] > 1:
+        # SparseAdam 的矩估计在各工作进程中惰性创建、无法放入共享内存，
+        # 主进程的优化器状态始终为空，检查点与 --resume 会丢失全部矩估计
+        raise ValueError("optimizer='sparse_adam' 不支持 workers > 1，多进程训练请使用 'adagrad'")
+
+    output_file = 'entity_emb_final.npy'
+    relation_file = 'relation_emb_final.npy'
+    mapping_file = 'entity2id_final.npy'  # 与 output_file 行号对应的实体映射
 
     # 加载实体映射
     entity_dict = np.load('entity2id.npy', allow_pickle=True).item()
@@ -96,64 +314,130 @@ def train_transE():
         num_entities=entity_count,
         num_relations=len(RELATION_TYPES),
         dim=config['dim'],
-        margin=config['margin']
+        margin=config['margin'],
+        debug=config['debug'],
+        sparse=config['sparse'] or config['workers'] > 1 or config['optimizer'] == 'sparse_adam',
+        entity_max_norm=config['entity_max_norm']
     )
 
+    # 检查点已标记早停或已跑满总轮数：只重新导出结果，不加载数据、不再训练
+    checkpoint = None
+    if resume and os.path.exists(config['checkpoint_file']):
+        checkpoint = torch.load(config['checkpoint_file'])
+        if checkpoint['state'].get('stopped') or checkpoint['epoch'] >= config['epochs']:
+            model.load_state_dict(checkpoint['model'])
+            export_embeddings(model, checkpoint['state'], entity_dict, output_file, mapping_file, relation_file)
+            print(f"✅ 检查点显示训练已于第 {checkpoint['epoch']} 轮结束，无需继续训练")
+            return
+
     # 数据加载
     print("\n🔍 加载训练数据...")
     try:
-        dataset = KGDataset('transE_train.txt')
-        loader = DataLoader(dataset, batch_size=config['batch_size'], shuffle=True)
-        print(f"✅ 有效三元组数量: {len(dataset):,}")
+        dataset = KGDataset('transE_train.txt', bernoulli=config['bernoulli'], debug=config['debug'])
+        train_idx, valid_idx = split_indices(len(dataset), config['valid_ratio'])
+        loader = batch_loader(dataset, config['batch_size'], indices=train_idx)
+        print(f"✅ 有效三元组数量: {len(dataset):,}（训练 {len(train_idx):,} / 验证 {len(valid_idx):,}）")
     except Exception as e:
         print(f"❌ 数据加载失败: {str(e)}")
         return
 
+    # 验证集负样本只采样一次，各轮损失可直接比较
+    valid_batch = dataset[valid_idx] if len(valid_idx) else None
+
     # 优化器
-    opt = torch.optim.Adagrad(model.parameters(), lr=config['lr'])
+    if config['optimizer'] == 'sparse_adam':
+        opt = torch.optim.SparseAdam(model.parameters(), lr=config['lr'])
+    else:
+        opt = torch.optim.Adagrad(model.parameters(), lr=config['lr'])
+
+    # 断点续训 / 热启动
+    state = {'best_loss': float('inf'), 'bad_epochs': 0}
+    start_epoch = 0
+    if checkpoint is not None:
+        model.load_state_dict(checkpoint['model'])
+        opt.load_state_dict(checkpoint['optimizer'])
+        state = checkpoint['state']
+        start_epoch = checkpoint['epoch']
+        print(f"♻️ 从第 {start_epoch} 轮检查点继续训练")
+    elif resume:
+        print(f"⚠️ 未找到检查点 {config['checkpoint_file']}，从头开始训练")
+    if start_epoch == 0 and config['warm_start']:
+        reused = warm_start(model, entity_dict, output_file, mapping_file, relation_file)
+        if reused:
+            print(f"🔥 热启动：复用上次训练的 {reused:,}/{entity_count:,} 个实体嵌入")
 
     # 训练准备
+    hogwild = None
+    if config['workers'] > 1:
+        opt.zero_grad(set_to_none=True)  # 梯度留给各工作进程自行分配，不共享
+        hogwild = HogwildTrainer(
+            model, opt, dataset, train_idx, config['batch_size'], config['workers'], config['threads_per_worker']
+        )
+        print(f"🧵 Hogwild 多进程训练：{config['workers']} 个进程 x {config['threads_per_worker']} 线程")
+    telemetry = TrainingTelemetry(config['telemetry_file'], config['telemetry_interval'])
     start_time = time.time()
-    print(f"\n🏁 开始训练（共 {config['epochs']} 轮）")
+    print(f"\n🏁 开始训练（第 {start_epoch + 1} - {config['epochs']} 轮）")
 
-    with tqdm(total=config['epochs'], desc="🌌 总进度", unit="epoch") as pbar_total:
-        for epoch in range(config['epochs']):
+    with tqdm(total=config['epochs'], initial=start_epoch, desc="🌌 总进度", unit="epoch") as pbar_total:
+        for epoch in range(start_epoch, config['epochs']):
             epoch_start = time.time()
             total_loss = 0
 
-            with tqdm(loader, desc=f"📅 Epoch {epoch + 1}", unit="batch", leave=False) as pbar_batch:
-                for batch_idx, (pos, neg) in enumerate(pbar_batch):
-                    # 最终检查（打印第一个错误样本）
-                    invalid_mask = pos[:, 2] >= len(RELATION_TYPES)
-                    if torch.any(invalid_mask):
-                        invalid_idx = torch.where(invalid_mask)[0][0].item()
-                        print(f"\n💥 异常正样本数据: {pos[invalid_idx].tolist()}")
-                        raise ValueError("关系索引越界")
+            model.train()
+            if hogwild is not None:
+                total_loss, num_batches = hogwild.run_epoch()
+            else:
+                with tqdm(loader, desc=f"📅 Epoch {epoch + 1}", unit="batch", leave=False) as pbar_batch:
+                    for batch in pbar_batch:
+                        loss = model(*batch)
 
-                    loss = model(*pos.T[:3], neg[:, 0], neg[:, 2])
+                        opt.zero_grad()
+                        loss.backward()
+                        opt.step()
 
-                    opt.zero_grad()
-                    loss.backward()
-                    opt.step()
+                        total_loss += loss.item()
+                num_batches = len(loader)
 
-                    total_loss += loss.item()
-                    pbar_batch.set_postfix({
-                        'loss': f"{loss.item():.3f}",
-                        'processed': f"{(batch_idx + 1) * config['batch_size']}/{len(dataset)}"
-                    })
-
-            avg_loss = total_loss / len(loader)
+            avg_loss = total_loss / num_batches
             epoch_time = time.time() - epoch_start
+            telemetry.on_epoch(epoch + 1, model, avg_loss, len(train_idx), epoch_time)
+            postfix = {'loss': f"{avg_loss:.3f}", 'time/epoch': f"{epoch_time:.1f}s"}
+
+            stop = False
+            if valid_batch is not None:
+                model.eval()
+                with torch.no_grad():
+                    valid_loss = model(*valid_batch).item()
+                postfix['valid'] = f"{valid_loss:.3f}"
+                if valid_loss < state['best_loss']:
+                    state = {
+                        'best_loss': valid_loss,
+                        'bad_epochs': 0,
+                        'best_entity': model.ent_emb.weight.detach().clone(),
+                        'best_relation': model.rel_emb.weight.detach().clone(),
+                    }
+                else:
+                    state['bad_epochs'] += 1
+                    stop = state['bad_epochs'] >= config['patience']
+                    state['stopped'] = stop  # 写入检查点，--resume 时不再多训一轮
+
             pbar_total.update(1)
-            pbar_total.set_postfix({
-                'loss': f"{avg_loss:.3f}",
-                'time/epoch': f"{epoch_time:.1f}s"
-            })
+            pbar_total.set_postfix(postfix)
+            if stop or (epoch + 1) % config['checkpoint_interval'] == 0 or epoch + 1 == config['epochs']:
+                save_checkpoint(config['checkpoint_file'], epoch + 1, model, opt, state)
+            if stop:
+                print(f"\n⏹️ 验证损失连续 {config['patience']} 轮未改善，于第 {epoch + 1} 轮早停")
+                break
+
+    if hogwild is not None:
+        hogwild.close()
 
-    # 保存结果
-    torch.save(model.ent_emb.weight.data.numpy(), 'entity_emb_final.npy')
+    export_embeddings(model, state, entity_dict, output_file, mapping_file, relation_file)
     print(f"\n🎉 训练完成！总耗时: {(time.time() - start_time) / 60:.1f} 分钟")
 
 
 if __name__ == '__main__':
-    train_transE()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='训练TransE知识图谱嵌入')
+    parser.add_argument('--resume', action='store_true', help='从检查点继续训练（模型与优化器状态）')
+    args = parser.parse_args()
+    train_transE(resume=args.resume)
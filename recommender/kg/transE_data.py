@@ -13,6 +13,31 @@ RELATION_TYPES = {
     'user_course': 4
 }
 
+# 路径搜索可沿用的关系：用户 -> 已学课程；课程 -> 其先修课程（三元组为 先修 -> 课程，需反向）
+NEIGHBOR_RELATIONS = {
+    RELATION_TYPES['user_course']: False,
+    RELATION_TYPES['course_prerequisite']: True,
+}
+ADJACENCY_FILE = 'transE_adj.npz'
+
+
+def build_adjacency(triples, num_entities):
+    """由 (h, t, r) 整数三元组构建 entity2id 索引上的CSR邻接（offsets, targets, relations）"""
+    triples = np.asarray(triples, dtype=np.int64).reshape(-1, 3)
+    src, dst, rel = [], [], []
+    for rel_type, reverse in NEIGHBOR_RELATIONS.items():
+        selected = triples[triples[:, 2] == rel_type]
+        heads, tails = selected[:, 0], selected[:, 1]
+        src.append(tails if reverse else heads)
+        dst.append(heads if reverse else tails)
+        rel.append(np.full(len(selected), rel_type, dtype=np.int8))
+
+    src = np.concatenate(src)
+    order = np.argsort(src, kind='stable')
+    offsets = np.zeros(num_entities + 1, dtype=np.int64)
+    np.cumsum(np.bincount(src, minlength=num_entities), out=offsets[1:])
+    return offsets, np.concatenate(dst)[order].astype(np.int32), np.concatenate(rel)[order]
+
 
 class TransEDataLoader:
     def __init__(self):
@@ -85,4 +110,9 @@ class TransEDataLoader:
                 f.write(f"{self.entity2id[h]}\t{self.entity2id[t]}\t{r}\n")
 
         np.save('entity2id.npy', self.entity2id)
+
+        # 预计算路径搜索用的邻接表，TransEPathFinder 加载后不再逐节点查库
+        indexed = [(self.entity2id[h], self.entity2id[t], r) for h, t, r in triples]
+        offsets, targets, relations = build_adjacency(indexed, len(self.entity2id))
+        np.savez(ADJACENCY_FILE, offsets=offsets, targets=targets, relations=relations)
         print(f"✅ 成功生成 {len(triples)} 个有效三元组")
\ No newline at end of file
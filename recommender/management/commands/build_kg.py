@@ -1,15 +1,79 @@
 # recommender/management/commands/build_kg.py
 #5.2 20:23
 #仅调用接口
-from django.core.management.base import BaseCommand
+import json
+from django.core.management.base import BaseCommand, CommandError
 from recommender.kg.build_kg import KnowledgeGraphBuilder
+from recommender.models import Concept, Course
 
 class Command(BaseCommand):
     help = '构建知识图谱'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--incremental',
+            action='store_true',
+            help='按变更集增量更新已有图谱（归一化边界变化时自动全量构建）'
+        )
+        parser.add_argument(
+            '--skip-search-indexes',
+            action='store_true',
+            help='增量更新时不重建ALT地标表与收缩层次（更快，但 alt/ch 查询退回深度启发/A*，直到下次重建）'
+        )
+        parser.add_argument(
+            '--changes',
+            type=str,
+            help='变更集JSON文件：{"concepts": [...], "courses": [...], "course_concepts": [[课程ID, 概念ID], ...]}'
+        )
+        parser.add_argument(
+            '--rollback',
+            type=int,
+            nargs='?',
+            const=1,
+            default=0,
+            help='将当前图谱版本回退N个快照（默认1），不重新构建'
+        )
+        parser.add_argument(
+            '--contraction',
+            action='store_true',
+            help=f'构建后额外预处理收缩层次覆盖图（供 PathFinder mode="ch" 查询；'
+                 f'节点数上限 {KnowledgeGraphBuilder.MAX_CONTRACTION_NODES}）'
+        )
+        parser.add_argument('--concepts', nargs='*', default=[], help='变更的概念ID')
+        parser.add_argument('--courses', nargs='*', default=[], help='变更的课程ID（名称/match_pre_courses）')
+
     def handle(self, *args, **options):
-        kg = KnowledgeGraphBuilder()
-        kg.build()
-        self.stdout.write(self.style.SUCCESS('成功构建知识图谱'))
+        if options['rollback']:
+            try:
+                version = KnowledgeGraphBuilder.rollback(options['rollback'])
+            except (FileNotFoundError, ValueError) as e:
+                raise CommandError(f'无法回滚: {e}')
+            self.stdout.write(self.style.SUCCESS(f'已回滚到知识图谱版本 {version}'))
+            return
+
+        if options['contraction']:
+            # 在构建前按节点数快速失败，避免图谱构建完才发现收缩层次无法在合理时间内完成
+            nodes = Concept.objects.count() + Course.objects.count()
+            if nodes > KnowledgeGraphBuilder.MAX_CONTRACTION_NODES:
+                raise CommandError(
+                    f'图谱约 {nodes} 个节点，超过收缩层次上限 {KnowledgeGraphBuilder.MAX_CONTRACTION_NODES}'
+                    f'（可通过 KG_MAX_CONTRACTION_NODES 调整）'
+                )
 
+        kg = KnowledgeGraphBuilder(contraction=options['contraction'] or None)
+        if not options['incremental']:
+            kg.build()
+            self.stdout.write(self.style.SUCCESS('成功构建知识图谱'))
+            return
 
+        changes = {}
+        if options['changes']:
+            with open(options['changes'], encoding='utf-8') as f:
+                changes = json.load(f)
+        kg.build_incremental(
+            concept_ids=changes.get('concepts', []) + options['concepts'],
+            course_concepts=changes.get('course_concepts', []),
+            course_ids=changes.get('courses', []) + options['courses'],
+            search_indexes=not options['skip_search_indexes'],
+        )
+        self.stdout.write(self.style.SUCCESS('成功增量更新知识图谱'))
@@ -0,0 +1,83 @@
+# recommender/management/commands/kg_stats.py
+import json
+from django.core.management.base import BaseCommand, CommandError
+from recommender.kg.build_kg import KnowledgeGraphBuilder
+from recommender.kg.stats import collect_graph_stats, collect_load_stats, profile_path_queries
+from recommender.models import User
+
+
+class Command(BaseCommand):
+    help = '知识图谱统计与路径查询性能剖析（用于路径服务容量规划）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=100, help='计时的路径查询次数（0为跳过，默认100）')
+        parser.add_argument('--backend', choices=['networkx', 'csr'], default='networkx', help='图存储后端')
+        parser.add_argument('--heuristic', choices=['depth', 'alt'], default='depth', help='A*启发函数')
+        parser.add_argument('--mode', choices=['astar', 'bidirectional', 'ch'], default='astar', help='查询模式')
+        parser.add_argument('--seed', type=int, default=0, help='抽样随机种子')
+        parser.add_argument('--json', action='store_true', help='以JSON格式输出')
+
+    def handle(self, *args, **options):
+        version = KnowledgeGraphBuilder.current_version()
+        try:
+            graph, _ = KnowledgeGraphBuilder.load_graph(version)
+        except FileNotFoundError:
+            raise CommandError('知识图谱尚未构建，请先运行 build_kg')
+
+        report = {
+            'version': version,
+            'graph': collect_graph_stats(graph),
+            'load': collect_load_stats(version),
+        }
+        if options['samples'] > 0:
+            users = User.objects.only('id', 'learned_concepts', 'learned_courses')
+            report['queries'] = profile_path_queries(
+                users,
+                samples=options['samples'],
+                seed=options['seed'],
+                backend=options['backend'],
+                heuristic=options['heuristic'],
+                mode=options['mode'],
+            )
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, ensure_ascii=False, indent=2))
+            return
+        self._print_report(report)
+
+    def _print_report(self, report):
+        graph = report['graph']
+        self.stdout.write(self.style.SUCCESS(f"知识图谱版本: {report['version']}"))
+        self.stdout.write(f"节点: {graph['nodes']} {graph['node_types']}")
+        self.stdout.write(f"边: {graph['edges']} {graph['edge_types']}")
+        for direction in ('out_degree', 'in_degree'):
+            for edge_type, summary in graph[direction].items():
+                if summary['count']:
+                    self.stdout.write(
+                        f"  {direction}[{edge_type}]: 节点数={summary['count']} "
+                        f"均值={summary['mean']:.2f} p95={summary['p95']:.0f} 最大={summary['max']:.0f}"
+                    )
+        self.stdout.write(
+            f"弱连通分量: {graph['weakly_connected_components']}  "
+            f"强连通分量: {graph['strongly_connected_components']}"
+        )
+        self.stdout.write(
+            f"最长概念先修链: {graph['max_prerequisite_chain']}  "
+            f"最长课程先修链: {graph['max_course_prerequisite_chain']}"
+        )
+
+        for fmt, load in report['load'].items():
+            extra = f" mmap数组={load['mmap_array_bytes'] / 2 ** 20:.1f}MB" if 'mmap_array_bytes' in load else ''
+            self.stdout.write(
+                f"加载[{fmt}]: {load['load_seconds'] * 1000:.1f}ms 堆内存={load['heap_bytes'] / 2 ** 20:.1f}MB{extra}"
+            )
+
+        queries = report.get('queries')
+        if queries and queries['samples']:
+            latency = queries['latency_ms']
+            expansions = queries['expansions']
+            self.stdout.write(
+                f"路径查询 x{queries['samples']} {queries['options']}: "
+                f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms "
+                f"扩展节点 均值={expansions['mean']:.0f} p95={expansions['p95']:.0f}"
+            )
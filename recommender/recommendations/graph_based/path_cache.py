@@ -0,0 +1,76 @@
+# recommender/recommendations/graph_based/path_cache.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+class PathResultCache:
+    """学习路径结果缓存（进程内LRU + TTL）
+
+    键 = (用户知识状态指纹, 目标课程, 图谱版本)。已学集合相同的用户共享同一结果；
+    旧版本的条目不会再被新版本的查询命中，由 LRU/TTL 自然淘汰（或显式 invalidate）。
+    不按版本整体清空：切换期间仍在旧句柄上完成的搜索会写入旧版本条目，清空会反复冲掉新版本结果。
+    """
+
+    def __init__(self, max_size=10000, ttl=3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(user):
+        """已学概念/课程集合的稳定哈希（与顺序、重复无关）"""
+        digest = hashlib.sha1()
+        for cid in sorted(set(map(str, user.learned_concepts))):
+            digest.update(f"concept:{cid}\n".encode('utf-8'))
+        for cid in sorted(set(map(str, user.learned_courses))):
+            digest.update(f"course:{cid}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, fingerprint, target_course_id, version):
+        key = (fingerprint, target_course_id, version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(entry[1])
+
+    def set(self, fingerprint, target_course_id, version, path):
+        key = (fingerprint, target_course_id, version)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), tuple(path))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self):
+        """图谱重建后批量失效"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'size': len(self._entries),
+            }
+
+
+path_result_cache = PathResultCache(
+    max_size=getattr(settings, 'PATH_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'PATH_CACHE_TTL', 3600),
+)
@@ -1,28 +1,164 @@
 # recommender/recommendations/graph_based/path_finder.py
 import heapq
+import logging
 import numpy as np
-from django.core.cache import cache
+from django.conf import settings
 from django.db.models import Q
 from recommender.kg.build_kg import KnowledgeGraphBuilder
+from recommender.kg.contraction import ContractionHierarchy
+from recommender.kg.course_closure import CourseClosureIndex
+from recommender.kg.csr_graph import EDGE_TYPE_FACTORS, CSRGraphAdapter
+from recommender.kg.landmarks import LandmarkIndex
+from recommender.kg.registry import graph_registry
+from recommender.recommendations.graph_based.path_cache import path_result_cache
+from recommender.recommendations.graph_based.search_context import search_context_store
 from recommender.models import Course
 
+logger = logging.getLogger(__name__)
+
+class ShortestPathTree:
+    """多源Dijkstra最短路径树（可按需续算）
+
+    所有起点距离为0；settle() 只推进到给定目标全部出堆为止，
+    之后再请求新目标时从保留的堆继续，不重复已完成的工作。
+    reverse=True 时沿入边搜索，dist 为各节点到起点（即目标）的距离。
+    """
+
+    def __init__(self, graph, start_nodes, weight_fn, reverse=False):
+        self.graph = graph
+        self.weight_fn = weight_fn
+        self.reverse = reverse
+        self.dist = {}
+        self.parent = {}
+        self.settled = set()
+        self._frontier = []
+        for node in start_nodes:
+            self.dist[node] = 0
+            self.parent[node] = None
+            heapq.heappush(self._frontier, (0, node))
+
+    def _settle_next(self):
+        """确定堆中下一个节点并松弛其邻边；堆空时返回 None"""
+        frontier = self._frontier
+        while frontier:
+            g_cost, current = heapq.heappop(frontier)
+            if current in self.settled or g_cost > self.dist[current]:
+                continue
+            self.settled.add(current)
+
+            if self.reverse:
+                edges = ((neighbor, self.weight_fn(neighbor, current)) for neighbor in self.graph.predecessors(current))
+            else:
+                edges = ((neighbor, self.weight_fn(current, neighbor)) for neighbor in self.graph.neighbors(current))
+            for neighbor, weight in edges:
+                if neighbor in self.settled:
+                    continue
+                new_g_cost = g_cost + weight
+                if new_g_cost < self.dist.get(neighbor, float('inf')):
+                    self.dist[neighbor] = new_g_cost
+                    self.parent[neighbor] = current
+                    heapq.heappush(frontier, (new_g_cost, neighbor))
+            return current
+        return None
+
+    def settle(self, target_nodes):
+        """推进搜索直到 target_nodes 全部确定（或不可达）"""
+        pending = set(target_nodes) - self.settled
+        while pending:
+            current = self._settle_next()
+            if current is None:
+                break
+            pending.discard(current)
+
+    def settle_within(self, limit):
+        """推进搜索直到距离不超过 limit 的节点全部确定"""
+        while self._frontier and self._frontier[0][0] <= limit:
+            self._settle_next()
+
+    def path_to(self, node):
+        """沿父指针回溯；未确定（不可达）时返回 None
+
+        返回按边方向排列的节点序列：正向树为 起点 -> node，反向树为 node -> 目标。
+        """
+        if node not in self.settled:
+            return None
+        path = []
+        while node is not None:
+            path.append(node)
+            node = self.parent[node]
+        if not self.reverse:
+            path.reverse()
+        return path
+
 
 class PathFinder:
-    CACHE_TIMEOUT = 3600 * 6  # 6小时缓存
     COURSE_PRIORITY_BOOST = 0.7  # 课程节点优先系数
+    # 图存储后端：'networkx'（pickle）或 'csr'（mmap共享的NumPy数组）
+    GRAPH_BACKEND = getattr(settings, 'KG_GRAPH_BACKEND', 'networkx')
+    _depth_range_cache = None  # ((backend, 图版本), (最小深度, 最大深度))
 
-    def __init__(self, target_course_id=None):
-        self.graph, self.node_mapping = self._load_graph()
-        self.reverse_mapping = {v: k for k, v in self.node_mapping.items()}
+    def __init__(self, target_course_id=None, backend=None, debug=False, heuristic='depth', use_cache=True,
+                 mode='astar'):
+        self.backend = backend or self.GRAPH_BACKEND
+        self.debug = debug  # 开启后输出逐节点调试日志
+        self.heuristic = heuristic  # 'depth'：深度差启发；'alt'：地标下界（可采纳）
+        # 'astar'：原图A*；'bidirectional'：起点集与目标同时出发的双向Dijkstra；
+        # 'ch'：收缩层次覆盖图上的双向搜索（未构建时退回A*）
+        self.mode = mode
+        self.use_cache = use_cache  # 按 (知识状态指纹, 目标, 图版本) 缓存结果
+        self.last_expansions = 0
+        handle = self._load_graph()
+        self.handle = handle
+        self.graph = handle.graph
+        self._csr = isinstance(self.graph, CSRGraphAdapter)  # CSR后端走数组直读的快速路径
+        self.node_mapping = handle.node_mapping
+        self.reverse_mapping = handle.reverse_mapping
+        self.graph_version = handle.version
         self.target_course_id = target_course_id
-        self.target_course = self._get_target_course()
+        self._target_course = None
 
     def _load_graph(self):
-        cached = cache.get('knowledge_graph')
-        if not cached:
-            cached = KnowledgeGraphBuilder.load_graph()
-            cache.set('knowledge_graph', cached, self.CACHE_TIMEOUT)
-        return cached
+        """从进程级注册表获取只读图谱（每进程只加载一次）"""
+        return graph_registry.get(self.backend)
+
+    def _load_artifact(self, filename, loader_cls, fallback):
+        """加载与当前图版本配套的派生索引（每个句柄只加载一次）；缺失或版本不符时返回 None
+
+        fallback: 不可用时采用的退化方案，仅用于日志
+        """
+        def loader():
+            try:
+                artifact = KnowledgeGraphBuilder.load_artifact(filename, loader_cls, self.graph_version)
+            except FileNotFoundError:
+                # 跳过搜索索引的增量版本不含地标表；收缩层次需显式开启
+                logger.info(f"No {filename} for graph version {self.graph_version}, {fallback}")
+                return None
+            if artifact.version != self.graph_version:
+                logger.warning(
+                    f"{filename} version {artifact.version} != graph version {self.graph_version}, {fallback}"
+                )
+                return None
+            return artifact
+
+        return self.handle.get_artifact(filename, loader)
+
+    def _load_landmarks(self):
+        return self._load_artifact(KnowledgeGraphBuilder.LANDMARKS_FILE, LandmarkIndex, 'using depth heuristic')
+
+    def _load_course_closure(self):
+        return self._load_artifact(
+            KnowledgeGraphBuilder.COURSE_CLOSURE_FILE, CourseClosureIndex, 'ordering by match_pre_courses'
+        )
+
+    def _load_contraction(self):
+        return self._load_artifact(KnowledgeGraphBuilder.CONTRACTION_FILE, ContractionHierarchy, 'falling back to A*')
+
+    @property
+    def target_course(self):
+        """目标课程按需查询（缓存命中时无需访问数据库）"""
+        if self._target_course is None:
+            self._target_course = self._get_target_course()
+        return self._target_course
 
     def _get_target_course(self):
         if not self.target_course_id:
@@ -31,138 +167,437 @@ class PathFinder:
 
     def _heuristic(self, current, target_node):
         """改进的启发式函数"""
-        node_data = self.graph.nodes[current]
-        target_data = self.graph.nodes[target_node]
-
         # 基础启发值（深度差异）
-        depth_diff = abs(node_data.get('depth', 0) - target_data.get('depth', 0))
+        depth_diff = abs(self._node_depth(current) - self._node_depth(target_node))
 
         # 类型优先系数
+        is_course = self._node_type(current) == 'course'
         type_boost = 1.0
-        if node_data['type'] == 'course':
+        if is_course:
             type_boost = self.COURSE_PRIORITY_BOOST
 
         # 课程先修匹配奖励
         course_boost = 1.0
-        if self.target_course and node_data['type'] == 'course':
-            if node_data['id'] in self.target_course.match_pre_courses:
+        if self.target_course and is_course:
+            if self._node_id(current) in self.target_course.match_pre_courses:
                 course_boost = 0.5  # 提高匹配先修课的优先级
 
         return (depth_diff * 0.5 + 1.0) * type_boost * course_boost
 
+    def _node_type(self, n):
+        return self.graph.node_type(n) if self._csr else self.graph.nodes[n]['type']
+
+    def _node_depth(self, n):
+        return self.graph.node_depth(n) if self._csr else self.graph.nodes[n].get('depth', 0)
+
+    def _node_id(self, n):
+        return self.graph.node_id(n) if self._csr else self.graph.nodes[n]['id']
+
+    def _weighted_neighbors(self, u):
+        """(邻居, 动态边权) 序列；CSR后端直接读取数组切片，不逐边构造属性字典"""
+        if self._csr:
+            return self.graph.weighted_neighbors(u)
+        return ((v, self._get_edge_weight(u, v)) for v in self.graph.neighbors(u))
+
     def _get_edge_weight(self, u, v):
         """动态调整边权重"""
+        if self._csr:
+            return self.graph.edge_weight(u, v)
         edge_data = self.graph[u][v]
-        base_weight = edge_data['weight']
+        # 强化课程先修边、弱化反向边（系数与ALT地标预计算共用）
+        return edge_data['weight'] * EDGE_TYPE_FACTORS.get(edge_data['type'], 1.0)
 
-        # 强化课程先修边
-        if edge_data['type'] == 'course_prerequisite':
-            return base_weight * 0.8
+    def _make_heuristic(self, target_node):
+        """返回 (h(node), 启发值上界松弛量)
 
-        # 弱化反向边
-        if edge_data['type'] == 'covered_by':
-            return base_weight * 1.2
+        'alt' 模式使用地标三角不等式下界（可采纳，松弛量为0）；
+        地标表不可用时退回深度启发。
+        """
+        if self.heuristic == 'alt':
+            landmarks = self._load_landmarks()
+            if landmarks is not None:
+                return landmarks.heuristic_for(target_node), 0.0
+        return (lambda node: self._heuristic(node, target_node)), self._heuristic_bound(target_node)
 
-        return base_weight
+    def _heuristic_bound(self, target_node):
+        """深度启发值的上界
 
-    def find_optimal_path(self, user):
-        """优化的路径搜索算法"""
-        if not self.target_course:
-            raise ValueError("Target course not specified")
+        深度启发不保证可采纳，提前终止时以其最大可能值作为松弛量：
+        当堆顶 f >= 已知最优代价 + 上界 时，剩余条目的 g 均不小于最优代价。
+        """
+        min_depth, max_depth = self._depth_range()
+        target_depth = self._node_depth(target_node)
+        return max(max_depth - target_depth, target_depth - min_depth) * 0.5 + 1.0
 
-        # 初始化起点
-        start_nodes = [
-                          self.node_mapping[f"concept:{cid}"]
-                          for cid in user.learned_concepts
-                          if f"concept:{cid}" in self.node_mapping
-                      ] + [
-                          self.node_mapping[f"course:{cid}"]
-                          for cid in user.learned_courses
-                          if f"course:{cid}" in self.node_mapping
-                      ]
+    def _depth_range(self):
+        """全图深度范围（按图版本缓存）"""
+        cached = PathFinder._depth_range_cache
+        if cached and cached[0] == (self.backend, self.graph_version):
+            return cached[1]
+        depths = [depth for _, depth in self.graph.nodes(data='depth', default=0)]
+        depth_range = (min(depths, default=0), max(depths, default=0))
+        PathFinder._depth_range_cache = ((self.backend, self.graph_version), depth_range)
+        return depth_range
 
-        target_node = self.node_mapping[f"course:{self.target_course.id}"]
+    def _get_start_nodes(self, user):
+        """用户已学概念/课程对应的起点节点"""
+        return [
+                   self.node_mapping[f"concept:{cid}"]
+                   for cid in user.learned_concepts
+                   if f"concept:{cid}" in self.node_mapping
+               ] + [
+                   self.node_mapping[f"course:{cid}"]
+                   for cid in user.learned_courses
+                   if f"course:{cid}" in self.node_mapping
+               ]
+
+    def _search(self, start_nodes, target_node):
+        """父指针A*，返回 (最优代价, 父指针表)
+
+        堆中只存 (f, g, node)，路径由父指针回溯；best_g 记录各节点当前最优 g，
+        过期条目直接跳过。目标出堆后继续搜索，直到剩余条目不可能再改进最优代价。
+        """
+        heuristic, slack = self._make_heuristic(target_node)
+        best_g = {}
+        parent = {}
         frontier = []
         for node in start_nodes:
-            heapq.heappush(frontier, (
-                self._heuristic(node, target_node),
-                0,  # g_cost
-                node,
-                []
-            ))
-
-        visited = {}
-        best_path = None
-        min_cost = float('inf')
+            best_g[node] = 0
+            parent[node] = None
+            heapq.heappush(frontier, (heuristic(node), 0, node))
 
+        best_cost = float('inf')
+        expansions = 0
         while frontier:
-            f_cost, g_cost, current, path = heapq.heappop(frontier)
+            f_cost, g_cost, current = heapq.heappop(frontier)
 
-            if current in visited and visited[current] <= g_cost:
-                continue
-            visited[current] = g_cost
+            if f_cost >= best_cost + slack:
+                break
+            if g_cost > best_g[current]:
+                continue  # 过期条目
 
+            expansions += 1
             if current == target_node:
-                if g_cost < min_cost:
-                    min_cost = g_cost
-                    best_path = path + [current]
+                best_cost = g_cost
                 continue
 
-            for neighbor in self.graph.neighbors(current):
-                edge_weight = self._get_edge_weight(current, neighbor)
-                new_g_cost = g_cost + edge_weight
-                new_f_cost = new_g_cost + self._heuristic(neighbor, target_node)
+            for neighbor, weight in self._weighted_neighbors(current):
+                new_g_cost = g_cost + weight
+                if new_g_cost >= best_cost or new_g_cost >= best_g.get(neighbor, float('inf')):
+                    continue
+                h_cost = heuristic(neighbor)
+                if h_cost == float('inf'):
+                    continue  # 地标下界证明该节点无法到达目标
+                best_g[neighbor] = new_g_cost
+                parent[neighbor] = current
+                heapq.heappush(frontier, (new_g_cost + h_cost, new_g_cost, neighbor))
 
-                if neighbor not in visited or new_g_cost < visited.get(neighbor, float('inf')):
-                    heapq.heappush(frontier, (
-                        new_f_cost,
-                        new_g_cost,
-                        neighbor,
-                        path + [current]
-                    ))
+        self.last_expansions = expansions  # 供 kg_stats 统计每次查询的扩展节点数
+        return best_cost, parent
 
-        return self._post_process(best_path)
+    def _find_path(self, start_nodes, target_node):
+        """按查询模式求 起点 -> 目标 的最优节点路径"""
+        if self.mode == 'ch':
+            hierarchy = self._load_contraction()
+            if hierarchy is not None:
+                _, path, self.last_expansions = hierarchy.query(start_nodes, target_node)
+                return path
+        if self.mode == 'bidirectional':
+            return self._search_bidirectional(start_nodes, target_node)[1]
+        _, parent = self._search(start_nodes, target_node)
+        return self._reconstruct_path(parent, target_node)
+
+    def _search_bidirectional(self, start_nodes, target_node):
+        """双向Dijkstra，返回 (最优代价, 节点路径)；不可达时路径为 None
+
+        正向从全部起点出发，反向沿入边从目标出发，每步推进队列较短的一侧；
+        两侧堆顶之和不小于已知最优代价时，不可能再出现更短的相遇路径，代价与单向搜索一致。
+        """
+        forward_dist = {node: 0 for node in start_nodes}
+        backward_dist = {target_node: 0}
+        forward_parent = dict.fromkeys(forward_dist)
+        backward_parent = {target_node: None}
+        forward_queue = [(0, node) for node in forward_dist]
+        backward_queue = [(0, target_node)]
+        heapq.heapify(forward_queue)
+        forward_settled = set()
+        backward_settled = set()
+
+        best_cost = 0 if target_node in forward_dist else float('inf')
+        meeting = target_node if target_node in forward_dist else None
+        expansions = 0
+        while forward_queue and backward_queue:
+            if forward_queue[0][0] + backward_queue[0][0] >= best_cost:
+                break
+            forward = len(forward_queue) <= len(backward_queue)
+            if forward:
+                queue, dist, parent, settled, other = (
+                    forward_queue, forward_dist, forward_parent, forward_settled, backward_dist)
+            else:
+                queue, dist, parent, settled, other = (
+                    backward_queue, backward_dist, backward_parent, backward_settled, forward_dist)
+            g_cost, current = heapq.heappop(queue)
+            if current in settled or g_cost > dist[current]:
+                continue
+            settled.add(current)
+            expansions += 1
 
-    def _post_process(self, path):
+            if forward:
+                edges = self._weighted_neighbors(current)
+            else:
+                edges = ((n, self._get_edge_weight(n, current)) for n in self.graph.predecessors(current))
+            for neighbor, weight in edges:
+                new_g_cost = g_cost + weight
+                if new_g_cost < dist.get(neighbor, float('inf')):
+                    dist[neighbor] = new_g_cost
+                    parent[neighbor] = current
+                    heapq.heappush(queue, (new_g_cost, neighbor))
+                if neighbor in other and new_g_cost + other[neighbor] < best_cost:
+                    best_cost = new_g_cost + other[neighbor]
+                    meeting = neighbor
+
+        self.last_expansions = expansions
+        if meeting is None:
+            return best_cost, None
+        path = []
+        node = meeting
+        while node is not None:
+            path.append(node)
+            node = forward_parent[node]
+        path.reverse()
+        node = backward_parent[meeting]
+        while node is not None:
+            path.append(node)
+            node = backward_parent[node]
+        # 按路径正向重新累加，使浮点代价与单向搜索的累加顺序完全一致
+        best_cost = 0
+        for u, v in zip(path, path[1:]):
+            best_cost += self._get_edge_weight(u, v)
+        return best_cost, path
+
+    @staticmethod
+    def _reconstruct_path(parent, target_node):
+        """沿父指针回溯出 起点 -> 目标 的节点序列"""
+        if target_node not in parent:
+            return None
+        path = []
+        node = target_node
+        while node is not None:
+            path.append(node)
+            node = parent[node]
+        path.reverse()
+        return path
+
+    def _session_tree(self, user, session_key):
+        """会话内复用的搜索上下文（已学集合或图谱版本变化时重建其最短路径树）"""
+        return search_context_store.get(
+            (self.backend, session_key),
+            path_result_cache.fingerprint(user),
+            self.graph_version,
+            lambda: ShortestPathTree(self.graph, self._get_start_nodes(user), self._get_edge_weight),
+        )
+
+    def find_optimal_path(self, user, session_key=None):
+        """优化的路径搜索算法
+
+        传入 session_key 时在该会话保留的最短路径树上增量求解，同一会话更换目标无需重新搜索。
+        """
+        if not self.target_course_id:
+            raise ValueError("Target course not specified")
+
+        if self.use_cache:
+            fingerprint = path_result_cache.fingerprint(user)
+            cached = path_result_cache.get(fingerprint, self.target_course_id, self.graph_version)
+            if cached is not None:
+                return cached
+
+        target_node = self.node_mapping[f"course:{self.target_course.id}"]
+        if session_key is not None:
+            context = self._session_tree(user, session_key)
+            with context.lock:
+                context.tree.settle([target_node])
+                path = context.tree.path_to(target_node)
+        else:
+            path = self._find_path(self._get_start_nodes(user), target_node)
+        result = self._post_process(path)
+
+        if self.use_cache:
+            path_result_cache.set(fingerprint, self.target_course_id, self.graph_version, result)
+        return result
+
+    def find_optimal_paths(self, user, target_course_ids, session_key=None):
+        """批量路径：一次多源Dijkstra扫描，从同一棵最短路径树中提取所有目标的路径
+
+        返回 {课程ID: 课程名称列表}，不存在或不可达的目标对应空列表。
+        传入 session_key 时复用（并续算）该会话的最短路径树。
+        """
+        results = {}
+        if self.use_cache:
+            fingerprint = path_result_cache.fingerprint(user)
+            for cid in target_course_ids:
+                cached = path_result_cache.get(fingerprint, cid, self.graph_version)
+                if cached is not None:
+                    results[cid] = cached
+
+        pending = [cid for cid in target_course_ids if cid not in results]
+        target_courses = Course.objects.in_bulk(pending) if pending else {}
+        target_nodes = {
+            cid: self.node_mapping[f"course:{cid}"]
+            for cid in target_courses
+            if f"course:{cid}" in self.node_mapping
+        }
+
+        paths = {}
+        if target_nodes:
+            if session_key is not None:
+                context = self._session_tree(user, session_key)
+                with context.lock:
+                    context.tree.settle(target_nodes.values())
+                    paths = {cid: context.tree.path_to(node) for cid, node in target_nodes.items()}
+            else:
+                tree = ShortestPathTree(self.graph, self._get_start_nodes(user), self._get_edge_weight)
+                tree.settle(target_nodes.values())
+                paths = {cid: tree.path_to(node) for cid, node in target_nodes.items()}
+        for cid in pending:
+            if cid not in target_nodes:
+                results[cid] = []
+                continue
+            results[cid] = self._post_process(paths[cid], target_courses[cid])
+            if self.use_cache:
+                path_result_cache.set(fingerprint, cid, self.graph_version, results[cid])
+
+        return {cid: results[cid] for cid in target_course_ids}
+
+    def find_k_paths(self, user, k=3, max_stretch=1.5):
+        """至多k条备选学习路径（课程序列各不相同），按代价升序，首条即最优路径
+
+        经由点（via-node）法：一棵正向最短路径树（起点 -> 各节点）与一棵反向树（各节点 -> 目标）
+        只各搜索一次，每个经由点 v 给出候选 起点 -> v -> 目标，代价为 d(s, v) + d(v, t)；
+        只保留不超过 max_stretch 倍最优代价的无环候选，后处理后按课程序列去重。
+        """
+        if not self.target_course_id:
+            raise ValueError("Target course not specified")
+        if k < 1:
+            raise ValueError(f"k must be >= 1, got {k}")
+        if max_stretch < 1:
+            raise ValueError(f"max_stretch must be >= 1, got {max_stretch}")
+        target_node = self.node_mapping[f"course:{self.target_course.id}"]
+
+        forward = ShortestPathTree(self.graph, self._get_start_nodes(user), self._get_edge_weight)
+        forward.settle([target_node])
+        if target_node not in forward.settled:
+            return []
+        limit = forward.dist[target_node] * max_stretch
+        forward.settle_within(limit)
+        backward = ShortestPathTree(self.graph, [target_node], self._get_edge_weight, reverse=True)
+        backward.settle_within(limit)
+
+        via_nodes = sorted(
+            (forward.dist[node] + backward.dist[node], node)
+            for node in forward.settled & backward.settled
+            if forward.dist[node] + backward.dist[node] <= limit
+        )
+        results = []
+        seen = set()
+        for _, node in via_nodes:
+            path = forward.path_to(node) + backward.path_to(node)[1:]
+            if len(set(path)) < len(path):
+                continue  # 正反两段相交成环
+            courses = self._post_process(path)
+            if tuple(courses) in seen:
+                continue
+            seen.add(tuple(courses))
+            results.append(courses)
+            if len(results) >= k:
+                break
+        return results
+
+    def _post_process(self, path, target_course=None):
         """路径后处理优化"""
         if not path:
             return []
+        target_course = target_course or self.target_course
 
         # 提取课程节点并去重
-        #course_ids = []
-        course_names = []  # 用于存储课程名称
+        course_nodes = []
         seen = set()
         for node in path:
-            # 调试输出
-            print(f"reverse_mapping[node]: {self.reverse_mapping[node]}")
+            if self.debug:
+                logger.debug(f"reverse_mapping[node]: {self.reverse_mapping[node]}")
             # 改为拆分第一个 `:`
             node_type, nid = self.reverse_mapping[node].split(':', 1)
-            # node_type, nid = self.reverse_mapping[node].split(':')
-            # if node_type == 'course' and nid not in seen:
-            #     seen.add(nid)
-            #     course_ids.append(nid)
-            # 如果是课程节点，获取课程名称
             if node_type == 'course' and nid not in seen:
                 seen.add(nid)
+                course_nodes.append((node, nid))
+
+        # 课程名称优先取构建时写入的节点属性，旧版图谱缺失时一次性批量查询
+        names = {}
+        missing = []
+        for node, nid in course_nodes:
+            name = self.graph.nodes[node].get('name')
+            if name is None:
+                missing.append(nid)
+            else:
+                names[nid] = name
+        if missing:
+            names.update(
+                (cid, course.name)
+                for cid, course in Course.objects.only('id', 'name').in_bulk(missing).items()
+            )
+        # 保持路径顺序，只用预计算的先修闭包修正路径内课程间真实的先修冲突；目标课程始终排在最后
+        closure = self._load_course_closure()
+        if closure is not None:
+            ordered = self._resolve_prerequisite_order(closure, [nid for _, nid in course_nodes], path[-1])
+            return [names.get(nid, f"课程 {nid} 不存在") for nid in ordered]
 
-                # 获取课程的名称
-                try:
-                    course = Course.objects.get(id=nid)  # 获取课程对象
-                    course_names.append(course.name)  # 添加课程名称
-                except Course.DoesNotExist:
-                        course_names.append(f"课程 {nid} 不存在")  # 如果课程不存在，则添加默认值
-        # 按目标课程的match_pre_courses排序
-        if self.target_course and self.target_course.match_pre_courses:
-            pre_courses = self.target_course.match_pre_courses
+        course_names = [names.get(nid, f"课程 {nid} 不存在") for _, nid in course_nodes]
+
+        # 旧版图谱无闭包索引：按目标课程的match_pre_courses排序
+        if target_course and target_course.match_pre_courses:
+            pre_courses = target_course.match_pre_courses
             course_names.sort(
                 key=lambda x: pre_courses.index(x) if x in pre_courses else len(pre_courses)
             )
 
         return course_names
 
+    def _resolve_prerequisite_order(self, closure, course_ids, target_node):
+        """稳定拓扑排序：无先修约束的课程保持路径中的相对顺序，
+        若路径靠后的课程是靠前课程的（传递）先修，则将其提前；互为先修（成环）时不调整。
+        """
+        target_id = None
+        node_type, nid = self.reverse_mapping[target_node].split(':', 1)
+        if node_type == 'course' and course_ids and course_ids[-1] == nid:
+            target_id = course_ids[-1]
+            course_ids = course_ids[:-1]
+
+        successors = [[] for _ in course_ids]
+        in_degree = [0] * len(course_ids)
+        for i, a in enumerate(course_ids):
+            for j, b in enumerate(course_ids):
+                if i != j and closure.requires(b, a) and not closure.requires(a, b):
+                    successors[i].append(j)  # a 是 b 的先修
+                    in_degree[j] += 1
+
+        ready = [i for i, degree in enumerate(in_degree) if degree == 0]
+        heapq.heapify(ready)
+        ordered = []
+        while ready:
+            i = heapq.heappop(ready)
+            ordered.append(course_ids[i])
+            for j in successors[i]:
+                in_degree[j] -= 1
+                if in_degree[j] == 0:
+                    heapq.heappush(ready, j)
+        if target_id is not None:
+            ordered.append(target_id)
+        return ordered
+
     @classmethod
     def schedule_graph_update(cls):
         """定时更新入口"""
         from recommender.kg.build_kg import KnowledgeGraphBuilder
         KnowledgeGraphBuilder().build()
-        cache.delete('knowledge_graph')
\ No newline at end of file
+        graph_registry.publish()
+        path_result_cache.invalidate()
+        search_context_store.clear()
\ No newline at end of file
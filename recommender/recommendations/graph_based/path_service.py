@@ -0,0 +1,64 @@
+# recommender/recommendations/graph_based/path_service.py
+import asyncio
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+from recommender.recommendations.graph_based.path_cache import path_result_cache
+from recommender.recommendations.graph_based.path_finder import PathFinder
+
+logger = logging.getLogger(__name__)
+
+
+class PathSearchService:
+    """在有界线程池中执行路径搜索，供异步视图调用
+
+    事件循环只等待 Future，不执行A*；相同 (知识状态指纹, 目标课程) 的并发请求
+    合并为一次计算，完成后统一返回同一结果。
+    """
+
+    def __init__(self, max_workers=4):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='path-search')
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def submit(self, user, target_course_id, session_key=None):
+        """提交查询；已有相同查询在途时直接复用其 Future"""
+        # 有意不含 session_key：会话只决定是否复用已有的最短路径树，不影响结果本身，
+        # 不同会话的相同查询同样可以合并；被合并的会话只是这次没有续算自己的树
+        key = (path_result_cache.fingerprint(user), target_course_id)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._executor.submit(self._search, user, target_course_id, session_key)
+            self._inflight[key] = future
+        # 在锁外注册：若任务已完成，回调会在当前线程立即执行
+        future.add_done_callback(lambda f: self._forget(key, f))
+        return future
+
+    def _forget(self, key, future):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+
+    @staticmethod
+    def _search(user, target_course_id, session_key):
+        try:
+            finder = PathFinder(target_course_id)
+            if f"course:{target_course_id}" not in finder.node_mapping:
+                return []  # 课程尚未进入知识图谱
+            return finder.find_optimal_path(user, session_key=session_key)
+        finally:
+            # 线程池线程不经过请求周期，需自行回收过期的数据库连接
+            close_old_connections()
+
+    async def find_path(self, user, target_course_id, session_key=None):
+        """异步等待查询结果；shield 保证单个客户端断开不会取消其他请求共享的计算"""
+        return await asyncio.shield(asyncio.wrap_future(self.submit(user, target_course_id, session_key)))
+
+
+path_search_service = PathSearchService(max_workers=getattr(settings, 'PATH_SEARCH_WORKERS', 4))
@@ -0,0 +1,72 @@
+# recommender/recommendations/graph_based/search_context.py
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+class SearchContext:
+    """一个会话内复用的搜索状态：由用户知识状态出发的最短路径树
+
+    同一会话反复更换目标时只续算树，不重新推导起点、不从头搜索。
+    树本身不是线程安全的，使用时须持有 lock。
+    """
+
+    __slots__ = ('fingerprint', 'version', 'tree', 'lock', 'touched')
+
+    def __init__(self, fingerprint, version, tree):
+        self.fingerprint = fingerprint
+        self.version = version
+        self.tree = tree
+        self.lock = threading.Lock()
+        self.touched = time.monotonic()
+
+
+class SearchContextStore:
+    """进程内会话搜索上下文（LRU + 空闲超时）
+
+    键为会话标识；用户已学集合指纹或图谱版本变化时丢弃旧树重新创建。
+    """
+
+    def __init__(self, max_size=1000, idle_timeout=1800):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._contexts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_key, fingerprint, version, tree_factory):
+        """返回可复用的上下文；不存在、过期或已失效时用 tree_factory() 新建"""
+        now = time.monotonic()
+        with self._lock:
+            context = self._contexts.get(session_key)
+            if context is not None and (
+                context.fingerprint != fingerprint
+                or context.version != version
+                or now - context.touched > self.idle_timeout
+            ):
+                context = None
+            if context is None:
+                context = SearchContext(fingerprint, version, tree_factory())
+                self._contexts[session_key] = context
+            context.touched = now
+            self._contexts.move_to_end(session_key)
+            while len(self._contexts) > self.max_size:
+                self._contexts.popitem(last=False)
+            return context
+
+    def discard(self, session_key):
+        with self._lock:
+            self._contexts.pop(session_key, None)
+
+    def clear(self):
+        with self._lock:
+            self._contexts.clear()
+
+    def __len__(self):
+        return len(self._contexts)
+
+
+search_context_store = SearchContextStore(
+    max_size=getattr(settings, 'PATH_SESSION_CONTEXTS', 1000),
+    idle_timeout=getattr(settings, 'PATH_SESSION_IDLE_TIMEOUT', 1800),
+)
@@ -1,20 +1,40 @@
+import os
 import numpy as np
 from heapq import heappop, heappush
 from django.db import connection
-import json
-from recommender.kg.transE_data import RELATION_TYPES
+from recommender.kg.build_kg import KnowledgeGraphBuilder
+from recommender.kg.cold_start import ColdStartIndex
+from recommender.kg.transE_data import ADJACENCY_FILE, build_adjacency
 
 
 class TransEPathFinder:
+    TRIPLES_FILE = 'transE_train.txt'
+
     def __init__(self):
-        self.emb = np.load('entity_emb.npy')
+        self.emb = self._load_normalized_embeddings('entity_emb.npy')
         self.entity2id = np.load('entity2id.npy', allow_pickle=True).item()
         self.id2entity = {v: k for k, v in self.entity2id.items()}
+        self.offsets, self.targets, self.relations = self._load_adjacency()
+        self._cold_start_index = None
+
+    @staticmethod
+    def _load_normalized_embeddings(path):
+        """加载时一次性做L2归一化，之后余弦相似度即点积"""
+        emb = np.load(path)
+        norms = np.linalg.norm(emb, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return emb / norms
+
+    def _load_adjacency(self):
+        """加载预计算的CSR邻接；缺失时由训练三元组现场构建"""
+        if os.path.exists(ADJACENCY_FILE):
+            with np.load(ADJACENCY_FILE) as data:
+                return data['offsets'], data['targets'], data['relations']
+        triples = np.loadtxt(self.TRIPLES_FILE, dtype=np.int64)
+        return build_adjacency(triples, len(self.entity2id))
 
     def _semantic_sim(self, id1, id2):
-        return np.dot(self.emb[id1], self.emb[id2]) / (
-                np.linalg.norm(self.emb[id1]) * np.linalg.norm(self.emb[id2])
-        )
+        return float(np.dot(self.emb[id1], self.emb[id2]))
 
     def _get_course_popularity(self, course_id):
         with connection.cursor() as cursor:
@@ -22,65 +42,60 @@ class TransEPathFinder:
             return cursor.fetchone()[0]
 
     def _cold_start_path(self, goal_course_id):
-        """冷启动策略：推荐热度最高的前置路径"""
-        with connection.cursor() as cursor:
-            cursor.execute("""
-                WITH RECURSIVE pre_path AS (
-                    SELECT id, match_pre_courses, popularity, 0 AS depth
-                    FROM course WHERE id = %s
-                    UNION ALL
-                    SELECT c.id, c.match_pre_courses, c.popularity, depth+1
-                    FROM course c, pre_path p
-                    WHERE c.id = ANY(p.match_pre_courses)
+        """冷启动策略：推荐热度最高的前置路径（查预计算的先修闭包索引）"""
+        if self._cold_start_index is None:
+            try:
+                self._cold_start_index = KnowledgeGraphBuilder.load_artifact(
+                    KnowledgeGraphBuilder.COLD_START_FILE, ColdStartIndex
                 )
-                SELECT id FROM pre_path ORDER BY popularity DESC LIMIT 5
-            """, [goal_course_id])
-            return [row[0] for row in cursor.fetchall()]
+            except FileNotFoundError:
+                # 图谱尚未构建时在内存中现算一份
+                self._cold_start_index = ColdStartIndex.from_database()
+        return self._cold_start_index.lookup(goal_course_id)
 
     def find_path(self, user_id, goal_course_id):
         # 冷启动处理
         if user_id not in self.entity2id:
             return self._cold_start_path(goal_course_id)
 
-        # A*搜索算法
+        # A*搜索算法（父指针回溯路径）
         start = self.entity2id[user_id]
         goal = self.entity2id[goal_course_id]
-        heap = [(0, start, [])]
-        visited = set()
+        goal_vec = self.emb[goal]
+        heap = [(0, start, -1)]
+        parent = {}
 
         while heap:
-            cost, current, path = heappop(heap)
+            cost, current, prev = heappop(heap)
+            if current in parent:
+                continue
+            parent[current] = prev
             if current == goal:
-                return [self.id2entity[n] for n in path + [current]]
-
-            if current in visited: continue
-            visited.add(current)
+                return [self.id2entity[n] for n in self._reconstruct_path(parent, current)]
 
-            # 获取邻居节点（需根据实际数据库关系实现）
-            neighbors = self._get_neighbors(current)
-            for neighbor, rel_type in neighbors:
-                weight = 1 - self._semantic_sim(current, neighbor)
-                heuristic = 1 - self._semantic_sim(neighbor, goal)
-                heappush(heap, (cost + weight + heuristic, neighbor, path + [current]))
+            # 一次矩阵-向量乘法为全部邻居打分
+            neighbors, _ = self._get_neighbors(current)
+            if not len(neighbors):
+                continue
+            vecs = self.emb[neighbors]
+            weights = 1 - vecs @ self.emb[current]
+            heuristics = 1 - vecs @ goal_vec
+            for neighbor, priority in zip(neighbors.tolist(), (cost + weights + heuristics).tolist()):
+                if neighbor not in parent:
+                    heappush(heap, (priority, neighbor, current))
 
         return self._cold_start_path(goal_course_id)  # 降级到冷启动
 
-    def _get_neighbors(self, entity_id):
-        """从数据库获取关联实体（示例实现）"""
-        entity = self.id2entity[entity_id]
-        neighbors = []
-
-        if entity.startswith('user_'):
-            # 用户学习过的课程
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT course_id FROM user_course WHERE user_id=%s", [entity])
-                neighbors.extend((self.entity2id[row[0]], RELATION_TYPES['user_course']) for row in cursor)
+    @staticmethod
+    def _reconstruct_path(parent, node):
+        path = []
+        while node != -1:
+            path.append(node)
+            node = parent[node]
+        path.reverse()
+        return path
 
-        elif entity.startswith('course_'):
-            # 课程先修关系
-            with connection.cursor() as cursor:
-                cursor.execute("SELECT match_pre_courses FROM course WHERE id=%s", [entity])
-                pre_courses = json.loads(cursor.fetchone()[0] or '[]')
-                neighbors.extend((self.entity2id[c], RELATION_TYPES['course_prerequisite']) for c in pre_courses)
-
-        return neighbors
\ No newline at end of file
+    def _get_neighbors(self, entity_id):
+        """从预加载的CSR邻接获取关联实体，返回 (邻居索引数组, 关系类型数组)"""
+        start, end = self.offsets[entity_id], self.offsets[entity_id + 1]
+        return self.targets[start:end], self.relations[start:end]
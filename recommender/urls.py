@@ -11,4 +11,5 @@ urlpatterns = [
     path('', views.home, name='home'),
     path('courses/<str:pk>/', views.course_detail, name='course-detail'),
     path('users/<str:pk>/', views.user_profile, name='user-profile'),
+    path('learning-path/<str:course_id>/', views.learning_path_view, name='learning-path'),
 ]
\ No newline at end of file
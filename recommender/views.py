@@ -1,3 +1,4 @@
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, render
 from .models import Course, User
 
@@ -29,16 +30,26 @@ def user_profile(request, pk):
 
 
 # recommender/views.py
-from .recommendations.graph_based.path_finder import PathFinder
+from .recommendations.graph_based.path_service import path_search_service
 
 #5.2 20:24
-def learning_path_view(request, course_id):
-    user = request.user
-    target_course = get_object_or_404(Course, id=course_id)
-    recommender = PathFinder()
-    path = recommender.recommend(user, target_course)
-
-    return render(request, 'recommender/path.html', {
-        'course': target_course,
-        'path': Course.objects.filter(id__in=path)
-    })
\ No newline at end of file
+async def learning_path_view(request, course_id):
+    """学习路径JSON接口：GET /learning-path/<课程ID>/?user=<用户ID>
+
+    路径搜索在有界线程池中执行，事件循环只等待结果。
+    """
+    user_id = request.GET.get('user')
+    if not user_id:
+        return JsonResponse({'error': '缺少参数 user'}, status=400)
+    try:
+        user = await User.objects.only('id', 'learned_concepts', 'learned_courses').aget(pk=user_id)
+    except User.DoesNotExist:
+        return JsonResponse({'error': f'用户 {user_id} 不存在'}, status=404)
+    if not await Course.objects.filter(id=course_id).aexists():
+        return JsonResponse({'error': f'课程 {course_id} 不存在'}, status=404)
+
+    # 同一会话更换目标时复用已有的最短路径树（会话键只读自Cookie，不访问会话存储）
+    session_key = request.session.session_key if hasattr(request, 'session') else None
+    # 课程尚未进入知识图谱时返回空路径（在线程池中按 node_mapping 判断）
+    path = await path_search_service.find_path(user, course_id, session_key)
+    return JsonResponse({'user': user.id, 'course': course_id, 'path': path})